@@ -0,0 +1,211 @@
+# ata_cli.py
+"""
+Geração de ATAs sem interface gráfica (servidor / cron). Uso:
+    python ata_cli.py --email usuario@empresa.com --inicio 01/03/2025 --fim 07/03/2025
+    python ata_cli.py --email usuario@empresa.com --inicio 01/03/2025 --workers 2 --relatorio atas.json
+
+Usa o token do Google salvo pelo app (carregar_token_google): o usuário precisa
+ter autenticado pelo menos uma vez na interface. Código de saída: 0 se todas as
+ATAs foram geradas, 1 se alguma falhou, 2 em erro de uso/autenticação, 130 se interrompido.
+"""
+import argparse
+import json
+import multiprocessing
+import signal
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+
+
+def _data(txt):
+    for formato in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(txt, formato)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"data inválida: {txt} (use dd/mm/aaaa)")
+
+
+def _carregar_credenciais(email):
+    from models.models_usuario import get_db_session, Usuario
+    from auth import carregar_token_google
+
+    session = get_db_session()
+    try:
+        usuario = session.query(Usuario).filter_by(email=email).first()
+        user_id = usuario.id if usuario else None
+    finally:
+        session.close()
+    if user_id is None:
+        return None, f"Usuário não encontrado: {email}"
+
+    creds = carregar_token_google(user_id)
+    if creds is None:
+        return None, "Token do Google ausente ou expirado: autentique pelo app antes de usar o modo linha de comando."
+    return creds, None
+
+
+class _Progresso:
+    """Barra do tqdm quando disponível; senão uma linha por ATA concluída."""
+
+    def __init__(self, total, ativo=True):
+        self.total = total
+        self.feitas = 0
+        self._barra = None
+        if ativo:
+            try:
+                from tqdm import tqdm
+                self._barra = tqdm(total=total, unit="ata", desc="ATAs")
+            except ImportError:
+                pass
+        self._ativo = ativo
+
+    def avancar(self, texto):
+        self.feitas += 1
+        if self._barra is not None:
+            self._barra.set_postfix_str(texto[:40])
+            self._barra.update(1)
+        elif self._ativo:
+            print(f"[{self.feitas}/{self.total}] {texto}", flush=True)
+
+    def fechar(self):
+        if self._barra is not None:
+            self._barra.close()
+
+
+def _interromper(signum, frame):
+    # Depois do primeiro sinal o encerramento já começou: os próximos são ignorados
+    # para não interromper o cancelamento nem a gravação do relatório
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise KeyboardInterrupt
+
+
+def _item_relatorio(event, status):
+    inicio, fim = status.get("inicio"), status.get("fim")
+    return {
+        "event_id": event.get("id"),
+        "titulo": event.get("summary", ""),
+        "data": event.get("start", {}).get("dateTime") or event.get("start", {}).get("date"),
+        "estado": status.get("estado_final", "nao_processada"),
+        "docx_path": status.get("docx_path"),
+        "mensagem": status.get("mensagem", ""),
+        "perfil": status.get("perfil"),
+        "modelo": status.get("modelo"),
+        "tempo_transcricao_s": status.get("tempo_transcricao"),
+        "duracao_s": round(fim - inicio, 1) if inicio and fim else None,
+    }
+
+
+def main():
+    from controllers.controllers_transcricao import PERFIS_TRANSCRICAO
+
+    parser = argparse.ArgumentParser(description="Gera ATAs das reuniões do Meet sem a interface gráfica")
+    parser.add_argument("--email", required=True, help="e-mail do usuário cadastrado no app")
+    parser.add_argument("--inicio", type=_data, required=True, help="data inicial (dd/mm/aaaa)")
+    parser.add_argument("--fim", type=_data, default=None, help="data final, inclusiva (padrão: hoje)")
+    parser.add_argument("--workers", type=int, default=None, help="ATAs processadas em paralelo (padrão: ATA_WORKERS)")
+    parser.add_argument("--perfil", default=None, choices=list(PERFIS_TRANSCRICAO), help="perfil de transcrição")
+    parser.add_argument("--filtro", default="", help="só reuniões cujo título/descrição contém estas palavras")
+    parser.add_argument("--relatorio", default=None, help="arquivo JSON do relatório (padrão: relatorio_atas_<data>.json)")
+    parser.add_argument("--sem-progresso", action="store_true", help="não mostra a barra de progresso")
+    args = parser.parse_args()
+
+    fim = (args.fim or datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)) + timedelta(days=1)
+    if fim <= args.inicio:
+        parser.error("--fim deve ser igual ou posterior a --inicio")
+
+    # Imports pesados só depois de validar os argumentos
+    from controllers.controllers_usuario import listar_reunioes, ata_status
+    from controllers.controllers_fila import agendador
+    from controllers.controllers_status import chave_job
+    from controllers.controllers_busca import IndiceEventos
+
+    creds, erro = _carregar_credenciais(args.email)
+    if erro:
+        print(erro, file=sys.stderr)
+        return 2
+
+    eventos = listar_reunioes(creds, args.inicio.astimezone(), fim.astimezone())
+    if args.filtro:
+        eventos = IndiceEventos(eventos).buscar(args.filtro)
+    eventos = [e for e in eventos if e.get("start", {}).get("dateTime")]
+    print(f"{len(eventos)} reuniões do Meet entre {args.inicio:%d/%m/%Y} e {fim - timedelta(days=1):%d/%m/%Y}.", flush=True)
+
+    relatorio_path = args.relatorio or f"relatorio_atas_{datetime.now():%Y%m%d_%H%M%S}.json"
+    t0 = time.time()
+    finais = {}
+    progresso = _Progresso(len(eventos), ativo=not args.sem_progresso)
+    lock = threading.Lock()
+
+    def callback(event_id, docx_path=None):
+        status = dict(ata_status.get(chave_job(args.email, event_id), {}))
+        if status.get("refinando"):
+            return  # rascunho: a ATA final ainda vem
+        if status.get("cancelado"):
+            status["estado_final"] = "cancelada"
+        elif status.get("ready"):
+            status["estado_final"] = "concluida"
+        else:
+            status["estado_final"] = "erro"
+        with lock:
+            finais[event_id] = status
+        progresso.avancar(f"{status['estado_final']}: {event_id}")
+
+    # SIGTERM (cron/systemd) se comporta como Ctrl+C: cancela e grava o relatório
+    signal.signal(signal.SIGINT, _interromper)
+    signal.signal(signal.SIGTERM, _interromper)
+
+    # Agendador global (a escolha adaptativa de modelo lê a fila dele); os workers só sobem no primeiro envio
+    if args.workers:
+        agendador.workers = max(1, args.workers)
+    agendador.max_fila = max(agendador.max_fila, len(eventos))
+    interrompido = False
+    try:
+        for event in eventos:
+            opcoes = {"perfil": args.perfil} if args.perfil else {}
+            agendador.enviar(event, creds, args.email, callback, bloquear=True, **opcoes)
+        while not agendador.aguardar_ociosidade(timeout=1):
+            pass
+    except KeyboardInterrupt:
+        interrompido = True
+        print("\nInterrompido: cancelando as ATAs em andamento...", file=sys.stderr, flush=True)
+        for event in eventos:
+            agendador.cancelar(event.get("id"), args.email, callback)
+        agendador.aguardar_ociosidade(timeout=60)
+    finally:
+        progresso.fechar()
+
+    itens = [_item_relatorio(e, finais.get(e.get("id"), {})) for e in eventos]
+    contagem = {}
+    for item in itens:
+        contagem[item["estado"]] = contagem.get(item["estado"], 0) + 1
+    relatorio = {
+        "usuario": args.email,
+        "inicio": args.inicio.strftime("%Y-%m-%d"),
+        "fim": (fim - timedelta(days=1)).strftime("%Y-%m-%d"),
+        "gerado_em": datetime.now().isoformat(timespec="seconds"),
+        "duracao_s": round(time.time() - t0, 1),
+        "interrompido": interrompido,
+        "total": len(itens),
+        "por_estado": contagem,
+        "reunioes": itens,
+    }
+    with open(relatorio_path, "w", encoding="utf-8") as f:
+        json.dump(relatorio, f, ensure_ascii=False, indent=2)
+
+    # Garante que o status dos jobs chegou à tabela ata_job antes de sair
+    ata_status.gravar_pendentes()
+
+    resumo = ", ".join(f"{n} {estado}" for estado, n in sorted(contagem.items())) or "nenhuma reunião"
+    print(f"Relatório: {relatorio_path} ({resumo})", flush=True)
+    if interrompido:
+        return 130
+    return 0 if contagem.get("concluida", 0) == len(itens) else 1
+
+
+if __name__ == '__main__':
+    # Necessário para o pool de transcrição paralela (processos filhos)
+    multiprocessing.freeze_support()
+    sys.exit(main())
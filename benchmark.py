@@ -0,0 +1,148 @@
+# benchmark.py
+"""
+Benchmarks da transcrição. Uso:
+    python benchmark.py paralelo caminho/reuniao.wav --modelo small --processos 4
+    python benchmark.py quantizado caminho/reuniao.wav --modelo small
+    python benchmark.py nucleos caminho/reuniao.wav --modelo small --jobs 3
+"""
+import argparse
+import difflib
+import multiprocessing
+import re
+import threading
+import time
+
+
+def bench_paralelo(args):
+    """Compara a chamada única do transcribe com a transcrição paralela por janelas."""
+    import whisper
+    from controllers.controllers_transcricao import transcrever_paralelo, SAMPLE_RATE
+
+    audio = whisper.load_audio(args.audio)
+    duracao = len(audio) / SAMPLE_RATE
+    print(f"Áudio: {duracao:.0f}s")
+
+    modelo = whisper.load_model(args.modelo)
+    t0 = time.perf_counter()
+    modelo.transcribe(audio, language='pt')
+    tempo_unico = time.perf_counter() - t0
+    del modelo
+    print(f"Chamada única:      {tempo_unico:8.1f}s (RTF {tempo_unico / duracao:.3f})")
+
+    # Primeira chamada inclui a carga do modelo em cada worker; a segunda mede só a transcrição
+    transcrever_paralelo(audio[:SAMPLE_RATE], args.modelo, processos=args.processos, language='pt')
+    resultado = transcrever_paralelo(audio, args.modelo, processos=args.processos, language='pt')
+    tempo_paralelo = resultado["tempo"]
+    print(f"Paralelo ({args.processos} proc.): {tempo_paralelo:8.1f}s (RTF {tempo_paralelo / duracao:.3f})")
+    print(f"Speedup: {tempo_unico / tempo_paralelo:.2f}x")
+
+
+def _palavras(texto):
+    from controllers.controllers_busca import normalizar_texto
+    return re.findall(r"\w+", normalizar_texto(texto))
+
+
+def bench_quantizado(args):
+    """Real-time factor e concordância de palavras entre fp32 e int8 no mesmo áudio."""
+    import whisper
+    from controllers.controllers_whisper import carregar_modelo, origem_modelo
+    from controllers.controllers_transcricao import SAMPLE_RATE
+
+    audio = whisper.load_audio(args.audio)
+    duracao = len(audio) / SAMPLE_RATE
+    origem = origem_modelo(args.modelo)
+    print(f"Áudio: {duracao:.0f}s | modelo: {origem}")
+
+    textos = {}
+    for nome, int8 in (("fp32", False), ("int8", True)):
+        t0 = time.perf_counter()
+        modelo = carregar_modelo(origem, int8=int8)
+        carga = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        textos[nome] = modelo.transcribe(audio, language='pt').get('text', '')
+        tempo = time.perf_counter() - t0
+        del modelo
+        print(f"{nome}: carga {carga:6.1f}s | transcrição {tempo:8.1f}s | RTF {tempo / duracao:.3f}")
+
+    ref, hip = _palavras(textos["fp32"]), _palavras(textos["int8"])
+    concordancia = difflib.SequenceMatcher(a=ref, b=hip, autojunk=False).ratio()
+    print(f"Concordância de palavras int8 x fp32: {concordancia:.1%} ({len(ref)} x {len(hip)} palavras)")
+
+
+def bench_nucleos(args):
+    """Vazão de N transcrições simultâneas: cada uma com todos os núcleos x AlocadorNucleos."""
+    import torch
+    import whisper
+    from controllers.controllers_whisper import carregar_modelo, origem_modelo
+    from controllers.controllers_cpu import AlocadorNucleos
+    from controllers.controllers_transcricao import SAMPLE_RATE
+
+    audio = whisper.load_audio(args.audio)
+    duracao = len(audio) / SAMPLE_RATE
+    # Um modelo por job: o transcribe instala hooks de kv-cache no próprio modelo
+    origem = origem_modelo(args.modelo)
+    modelos = [carregar_modelo(origem) for _ in range(args.jobs)]
+    padrao = torch.get_num_threads()
+    print(f"Áudio: {duracao:.0f}s | {args.jobs} jobs | {padrao} threads por padrão")
+
+    def rodada(alocador):
+        if alocador:
+            # Regime estável: todos os jobs já ativos quando a transcrição começa
+            for i in range(args.jobs):
+                alocador.entrar(i)
+
+        def job(i):
+            if alocador:
+                alocador.aplicar(i)
+            else:
+                torch.set_num_threads(padrao)
+            try:
+                modelos[i].transcribe(audio, language='pt')
+            finally:
+                if alocador:
+                    alocador.sair(i)
+
+        threads = [threading.Thread(target=job, args=(i,)) for i in range(args.jobs)]
+        t0 = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - t0
+
+    for nome, alocador in (("livre", None), ("alocador", AlocadorNucleos(args.nucleos))):
+        tempo = rodada(alocador)
+        vazao = args.jobs * duracao / tempo
+        print(f"{nome:9s}: {tempo:8.1f}s no total | vazão {vazao:6.2f}s de áudio por segundo")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de transcrição")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("paralelo", help="chamada única x pool de processos")
+    p.add_argument("audio")
+    p.add_argument("--modelo", default="small")
+    p.add_argument("--processos", type=int, default=max(1, (multiprocessing.cpu_count() or 2) // 2))
+    p.set_defaults(func=bench_paralelo)
+
+    p = sub.add_parser("quantizado", help="fp32 x int8 (RTF e concordância)")
+    p.add_argument("audio")
+    p.add_argument("--modelo", default="small")
+    p.set_defaults(func=bench_quantizado)
+
+    p = sub.add_parser("nucleos", help="transcrições simultâneas: livre x AlocadorNucleos")
+    p.add_argument("audio")
+    p.add_argument("--modelo", default="small")
+    p.add_argument("--jobs", type=int, default=3)
+    p.add_argument("--nucleos", type=int, default=None)
+    p.set_defaults(func=bench_nucleos)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    main()
@@ -0,0 +1,270 @@
+# controllers_agenda.py
+import os
+import json
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+# ----------------------------
+# Configuração (.env)
+# ----------------------------
+AGENDA_CACHE_DIR = os.getenv("AGENDA_CACHE_DIR", "cache_agenda")
+# Janela inicial da agenda: N dias para trás e M dias para frente de hoje
+AGENDA_JANELA_DIAS = int(os.getenv("AGENDA_JANELA_DIAS", "90"))
+AGENDA_FUTURO_DIAS = int(os.getenv("AGENDA_FUTURO_DIAS", "7"))
+# Piso da expansão automática (rolagem): não busca reuniões mais antigas que N dias
+AGENDA_LIMITE_DIAS = int(os.getenv("AGENDA_LIMITE_DIAS", "1825"))
+
+# Apenas os campos usados pela MainScreen e pelo processar_ata
+CAMPOS_EVENTO = (
+    "id,status,summary,description,organizer/email,start,end,"
+    "hangoutLink,conferenceData/entryPoints/uri"
+)
+CAMPOS_LISTA = f"nextPageToken,nextSyncToken,items({CAMPOS_EVENTO})"
+
+
+def eh_reuniao_meet(e):
+    return 'hangoutLink' in e or bool(e.get('conferenceData') and e['conferenceData'].get('entryPoints'))
+
+
+def _inicio_evento(e):
+    start = e.get('start', {})
+    return start.get('dateTime') or start.get('date') or ""
+
+
+def formatar_rfc3339(dt):
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def buscar_eventos(service, time_min=None, time_max=None, sync_token=None):
+    """
+    Pagina o events().list do calendário principal pedindo só CAMPOS_LISTA.
+    Retorna (eventos, nextSyncToken). Com sync_token a API não aceita timeMin/timeMax.
+    """
+    eventos = []
+    page_token = None
+    while True:
+        params = dict(
+            calendarId='primary',
+            maxResults=2500,
+            singleEvents=True,
+            pageToken=page_token,
+            fields=CAMPOS_LISTA
+        )
+        if sync_token:
+            params['syncToken'] = sync_token
+        else:
+            if time_min:
+                params['timeMin'] = formatar_rfc3339(time_min)
+            if time_max:
+                params['timeMax'] = formatar_rfc3339(time_max)
+        events_result = service.events().list(**params).execute()
+        eventos.extend(events_result.get('items', []))
+        page_token = events_result.get('nextPageToken')
+        if not page_token:
+            return eventos, events_result.get('nextSyncToken')
+
+
+def _ler_data(txt):
+    return datetime.strptime(txt, "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc) if txt else None
+
+
+# ----------------------------
+# Agenda local com sincronização incremental
+# ----------------------------
+class AgendaLocal:
+    """
+    Reuniões do Meet de um usuário, persistidas em JSON junto com o
+    nextSyncToken do Calendar. A carga inicial cobre só a janela
+    [hoje - AGENDA_JANELA_DIAS, hoje + AGENDA_FUTURO_DIAS]; depois disso cada
+    sincronização busca apenas o que mudou e a janela cresce sob demanda.
+    A expansão automática para trás para (`historico_esgotado`) quando um
+    período volta vazio ou a janela chega a AGENDA_LIMITE_DIAS.
+    """
+
+    def __init__(self, usuario_email):
+        safe_email = str(usuario_email).replace("@", "_").replace(".", "_")
+        self.caminho = os.path.join(AGENDA_CACHE_DIR, f"{safe_email}.json")
+        self.eventos = {}
+        self.sync_token = None
+        # None = sem limite (agendas antigas, sincronizadas com o histórico inteiro)
+        self.janela_inicio = None
+        self.janela_fim = None
+        self.historico_esgotado = False
+        self._lock = threading.Lock()
+        self._carregar()
+
+    def listar(self):
+        """Eventos em cache, dos mais recentes para os mais antigos."""
+        with self._lock:
+            return sorted(self.eventos.values(), key=_inicio_evento, reverse=True)
+
+    def cobre(self, data_inicio=None, data_fim=None):
+        """True se a janela já carregada vai de `data_inicio` (ou antes) até `data_fim` (ou depois)."""
+        with self._lock:
+            if self.janela_inicio is None:
+                return True
+            return (
+                (data_inicio is None or self.janela_inicio <= data_inicio)
+                and (data_fim is None or self.janela_fim is None or data_fim <= self.janela_fim)
+            )
+
+    def pode_expandir(self):
+        """True se ainda há histórico a buscar pela expansão automática (rolagem)."""
+        with self._lock:
+            return self.janela_inicio is not None and not self.historico_esgotado
+
+    def sincronizar(self, creds):
+        """Aplica as mudanças desde o último syncToken (ou faz a carga completa) e retorna a lista."""
+        service = build('calendar', 'v3', credentials=creds)
+        agora = datetime.now(timezone.utc)
+        completa = self.sync_token is None
+        try:
+            if completa:
+                alterados, token = self._carga_completa(service, agora)
+            else:
+                alterados, token = buscar_eventos(service, sync_token=self.sync_token)
+        except HttpError as e:
+            if e.resp.status != 410:
+                raise
+            # 410 Gone: o token expirou, é preciso refazer a carga completa
+            logging.info("syncToken do Calendar expirado; refazendo carga completa.")
+            completa = True
+            alterados, token = self._carga_completa(service, agora)
+
+        with self._lock:
+            if completa:
+                self.eventos = {}
+                self.janela_inicio = agora - timedelta(days=AGENDA_JANELA_DIAS)
+                self.janela_fim = agora + timedelta(days=AGENDA_FUTURO_DIAS)
+                self.historico_esgotado = False
+            self._aplicar(alterados)
+            self.sync_token = token
+            janela_fim = self.janela_fim
+
+        # Ocorrências de eventos recorrentes não "mudam" quando a data chega;
+        # por isso a borda futura da janela é estendida com uma busca por período.
+        limite_futuro = agora + timedelta(days=AGENDA_FUTURO_DIAS)
+        if janela_fim is not None and janela_fim < limite_futuro:
+            novos, _ = buscar_eventos(service, time_min=janela_fim, time_max=limite_futuro)
+            with self._lock:
+                self._aplicar(novos)
+                self.janela_fim = max(self.janela_fim, limite_futuro)
+
+        with self._lock:
+            self._salvar()
+
+        logging.info(
+            f"Agenda sincronizada ({'completa' if completa else 'incremental'}): "
+            f"{len(alterados)} eventos recebidos, {len(self.eventos)} reuniões em cache."
+        )
+        return self.listar()
+
+    def expandir(self, creds, novo_inicio=None, novo_fim=None):
+        """
+        Estende a janela para trás até `novo_inicio` e para frente até `novo_fim`,
+        buscando só os períodos que faltam. Sem nenhum dos dois (rolagem), volta
+        mais AGENDA_JANELA_DIAS, respeitando o piso AGENDA_LIMITE_DIAS; um período
+        vazio ou o piso marcam `historico_esgotado`. Retorna a lista atualizada.
+        """
+        automatica = novo_inicio is None and novo_fim is None
+        with self._lock:
+            janela_inicio, janela_fim = self.janela_inicio, self.janela_fim
+            parar = janela_inicio is None or (automatica and self.historico_esgotado)
+        if parar:
+            return self.listar()
+
+        if automatica:
+            piso = datetime.now(timezone.utc) - timedelta(days=AGENDA_LIMITE_DIAS)
+            novo_inicio = max(janela_inicio - timedelta(days=AGENDA_JANELA_DIAS), piso)
+
+        periodos = []
+        if novo_inicio is not None and novo_inicio < janela_inicio:
+            periodos.append((novo_inicio, janela_inicio))
+        if novo_fim is not None and janela_fim is not None and novo_fim > janela_fim:
+            periodos.append((janela_fim, novo_fim))
+
+        service = build('calendar', 'v3', credentials=creds) if periodos else None
+        recebidos = []
+        for time_min, time_max in periodos:
+            novos, _ = buscar_eventos(service, time_min=time_min, time_max=time_max)
+            recebidos.extend(novos)
+
+        with self._lock:
+            self._aplicar(recebidos)
+            if novo_inicio is not None and novo_inicio < self.janela_inicio:
+                self.janela_inicio = novo_inicio
+            if novo_fim is not None and self.janela_fim is not None and novo_fim > self.janela_fim:
+                self.janela_fim = novo_fim
+            esgotado = automatica and (not recebidos or self.janela_inicio <= piso)
+            if esgotado:
+                self.historico_esgotado = True
+            self._salvar()
+
+        for time_min, time_max in periodos:
+            logging.info(f"Agenda expandida: {formatar_rfc3339(time_min)} a {formatar_rfc3339(time_max)}.")
+        logging.info(f"Expansão da agenda: {len(recebidos)} eventos recebidos.")
+        if esgotado:
+            logging.info("Agenda: início do histórico alcançado; expansão automática encerrada.")
+        return self.listar()
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _carga_completa(self, service, agora):
+        # A janela só é gravada (sob o lock) junto com os eventos, em sincronizar
+        return buscar_eventos(
+            service,
+            time_min=agora - timedelta(days=AGENDA_JANELA_DIAS),
+            time_max=agora + timedelta(days=AGENDA_FUTURO_DIAS)
+        )
+
+    def _aplicar(self, alterados):
+        for e in alterados:
+            if e.get('status') == 'cancelled' or not eh_reuniao_meet(e):
+                self.eventos.pop(e['id'], None)
+            else:
+                self.eventos[e['id']] = e
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            self.eventos = {e['id']: e for e in dados.get('eventos', [])}
+            self.sync_token = dados.get('sync_token')
+            self.janela_inicio = _ler_data(dados.get('janela_inicio'))
+            self.janela_fim = _ler_data(dados.get('janela_fim'))
+            self.historico_esgotado = bool(dados.get('historico_esgotado'))
+        except Exception as e:
+            logging.warning(f"Agenda local inválida ({self.caminho}): {e}")
+
+    def _salvar(self):
+        os.makedirs(AGENDA_CACHE_DIR, exist_ok=True)
+        tmp = self.caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "sync_token": self.sync_token,
+                "janela_inicio": formatar_rfc3339(self.janela_inicio) if self.janela_inicio else None,
+                "janela_fim": formatar_rfc3339(self.janela_fim) if self.janela_fim else None,
+                "historico_esgotado": self.historico_esgotado,
+                "eventos": list(self.eventos.values()),
+            }, f, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+
+_agendas = {}
+_agendas_lock = threading.Lock()
+
+
+def obter_agenda(usuario_email):
+    """Instância única de AgendaLocal por usuário."""
+    with _agendas_lock:
+        if usuario_email not in _agendas:
+            _agendas[usuario_email] = AgendaLocal(usuario_email)
+        return _agendas[usuario_email]
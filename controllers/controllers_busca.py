@@ -0,0 +1,99 @@
+# controllers_busca.py
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+
+def normalizar_texto(texto):
+    """Minúsculas e sem acentos ("Reunião" -> "reuniao")."""
+    sem_acentos = ''.join(
+        c for c in unicodedata.normalize('NFD', texto or "")
+        if unicodedata.category(c) != 'Mn'
+    )
+    return sem_acentos.lower()
+
+
+def _tokens(texto):
+    return re.findall(r"\w+", normalizar_texto(texto))
+
+
+def _data_evento(e):
+    start = e.get('start', {})
+    start_str = start.get('dateTime') or start.get('date') or ""
+    try:
+        return date(int(start_str[0:4]), int(start_str[5:7]), int(start_str[8:10]))
+    except (ValueError, IndexError):
+        return None
+
+
+# ----------------------------
+# Índice de busca de eventos
+# ----------------------------
+class IndiceEventos:
+    """
+    Índice montado uma vez por carga de eventos:
+    - tokens normalizados (sem acento) de título, descrição e organizador,
+      ordenados para busca por prefixo com bisect;
+    - datas de início ordenadas para consultas por intervalo.
+    `buscar` devolve os eventos na mesma ordem da lista original.
+    """
+
+    def __init__(self, eventos):
+        self.eventos = list(eventos)
+
+        postings = {}
+        datas = []
+        for i, e in enumerate(self.eventos):
+            texto = " ".join((
+                e.get('summary') or "",
+                e.get('description') or "",
+                e.get('organizer', {}).get('email') or "",
+            ))
+            for token in set(_tokens(texto)):
+                postings.setdefault(token, []).append(i)
+
+            data_evento = _data_evento(e)
+            if data_evento:
+                datas.append((data_evento.toordinal(), i))
+
+        self._tokens = sorted(postings)
+        self._postings = [postings[t] for t in self._tokens]
+
+        datas.sort()
+        self._datas = [d for d, _ in datas]
+        self._indices_por_data = [i for _, i in datas]
+
+    def _por_prefixo(self, prefixo):
+        inicio = bisect_left(self._tokens, prefixo)
+        fim = bisect_left(self._tokens, prefixo + "￿")
+        encontrados = set()
+        for lista in self._postings[inicio:fim]:
+            encontrados.update(lista)
+        return encontrados
+
+    def _por_data(self, data_inicio, data_fim):
+        inicio = bisect_left(self._datas, data_inicio.toordinal()) if data_inicio else 0
+        fim = bisect_right(self._datas, data_fim.toordinal()) if data_fim else len(self._datas)
+        return set(self._indices_por_data[inicio:fim])
+
+    def buscar(self, termo="", data_inicio=None, data_fim=None):
+        """
+        Eventos cujo texto contém todas as palavras de `termo` (como prefixo de
+        alguma palavra) e cuja data está em [data_inicio, data_fim].
+        """
+        candidatos = None
+
+        for palavra in _tokens(termo):
+            encontrados = self._por_prefixo(palavra)
+            candidatos = encontrados if candidatos is None else candidatos & encontrados
+            if not candidatos:
+                return []
+
+        if data_inicio or data_fim:
+            por_data = self._por_data(data_inicio, data_fim)
+            candidatos = por_data if candidatos is None else candidatos & por_data
+
+        if candidatos is None:
+            return list(self.eventos)
+        return [self.eventos[i] for i in sorted(candidatos)]
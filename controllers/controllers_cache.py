@@ -0,0 +1,82 @@
+# controllers_cache.py
+import os
+import json
+import hashlib
+import logging
+import threading
+
+# ----------------------------
+# Configuração do cache (.env)
+# ----------------------------
+CACHE_TRANSCRICOES_DIR = os.getenv("CACHE_TRANSCRICOES_DIR", "cache_transcricoes")
+CACHE_TRANSCRICOES_MAX_MB = int(os.getenv("CACHE_TRANSCRICOES_MAX_MB", "500"))
+
+_lock = threading.Lock()
+
+
+def chave_cache(video_file, modelo, opcoes):
+    """
+    Chave de conteúdo: md5Checksum do arquivo no Drive (ou id + tamanho quando o
+    Drive não informa o md5), nome do modelo e opções da transcrição.
+    """
+    conteudo = video_file.get('md5Checksum') or f"{video_file['id']}:{video_file.get('size', '')}"
+    base = json.dumps({
+        "conteudo": conteudo,
+        "modelo": os.path.basename(str(modelo)),
+        "opcoes": opcoes,
+    }, sort_keys=True)
+    return hashlib.sha256(base.encode("utf-8")).hexdigest()
+
+
+def _caminho(chave):
+    return os.path.join(CACHE_TRANSCRICOES_DIR, f"{chave}.json")
+
+
+def ler_cache(chave):
+    """Retorna {"text", "segments"} da transcrição em cache, ou None."""
+    caminho = _caminho(chave)
+    with _lock:
+        if not os.path.exists(caminho):
+            return None
+        try:
+            with open(caminho, "r", encoding="utf-8") as f:
+                dados = json.load(f)
+            os.utime(caminho)  # marca como usado recentemente (LRU por mtime)
+            return dados
+        except Exception as e:
+            logging.warning(f"Entrada de cache corrompida ({caminho}): {e}")
+            os.remove(caminho)
+            return None
+
+
+def gravar_cache(chave, text, segments):
+    os.makedirs(CACHE_TRANSCRICOES_DIR, exist_ok=True)
+    caminho = _caminho(chave)
+    with _lock:
+        tmp = caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"text": text, "segments": segments}, f, ensure_ascii=False)
+        os.replace(tmp, caminho)
+        _aplicar_limite()
+
+
+def _aplicar_limite():
+    """Remove as entradas usadas há mais tempo até o cache caber em CACHE_TRANSCRICOES_MAX_MB."""
+    limite = CACHE_TRANSCRICOES_MAX_MB * 1024 * 1024
+    entradas = []
+    for nome in os.listdir(CACHE_TRANSCRICOES_DIR):
+        if nome.endswith(".json"):
+            caminho = os.path.join(CACHE_TRANSCRICOES_DIR, nome)
+            st = os.stat(caminho)
+            entradas.append((st.st_mtime, st.st_size, caminho))
+
+    total = sum(tamanho for _, tamanho, _ in entradas)
+    for _, tamanho, caminho in sorted(entradas):
+        if total <= limite:
+            break
+        try:
+            os.remove(caminho)
+            total -= tamanho
+            logging.info(f"Cache de transcrição: removida entrada antiga {os.path.basename(caminho)}")
+        except OSError:
+            pass
@@ -0,0 +1,159 @@
+# controllers_cancelamento.py
+import logging
+import threading
+
+from controllers.controllers_cpu import alocador_nucleos
+
+
+class AtaCancelada(Exception):
+    """Disparada dentro do job quando o usuário cancela a ATA."""
+
+
+class TokenCancelamento:
+    """
+    Pedido de cancelamento de um job. O job consulta `verificar()` nos pontos
+    seguros (chunks do download, segmentos do Whisper); subprocessos
+    registrados (ffmpeg) são encerrados na hora em que o cancelamento chega.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self._evento = threading.Event()
+        self._processos = set()
+        self._lock = threading.Lock()
+
+    @property
+    def cancelado(self):
+        return self._evento.is_set()
+
+    def verificar(self):
+        if self._evento.is_set():
+            raise AtaCancelada("ATA cancelada pelo usuário.")
+
+    def cancelar(self):
+        logging.info(f"[{self.job}] Cancelamento solicitado.")
+        self._evento.set()
+        with self._lock:
+            processos = list(self._processos)
+        for proc in processos:
+            _encerrar(proc)
+
+    def registrar_processo(self, proc):
+        with self._lock:
+            self._processos.add(proc)
+        if self._evento.is_set():
+            _encerrar(proc)
+
+    def remover_processo(self, proc):
+        with self._lock:
+            self._processos.discard(proc)
+
+
+def _encerrar(proc):
+    try:
+        if proc.poll() is None:
+            proc.kill()
+    except Exception as e:
+        logging.warning(f"Falha ao encerrar subprocesso: {e}")
+
+
+# ----------------------------
+# Tokens por job
+# ----------------------------
+_tokens = {}  # chave do job (chave_job) -> token
+_tokens_lock = threading.Lock()
+_local = threading.local()
+
+
+def criar_token(job):
+    """
+    Cria e registra o token do job. O agendador o cria ao enfileirar, então um
+    cancelamento pedido antes de o job começar fica guardado no próprio token.
+    """
+    token = TokenCancelamento(job)
+    with _tokens_lock:
+        _tokens[job] = token
+    return token
+
+
+def iniciar_token(job):
+    """Associa à thread atual o token do job (ver token_atual), criando-o se preciso."""
+    with _tokens_lock:
+        token = _tokens.get(job)
+        if token is None:
+            token = _tokens[job] = TokenCancelamento(job)
+    _local.token = token
+    return token
+
+
+def encerrar_token(token):
+    """Remove o registro do token (só se ainda for o token atual do job)."""
+    with _tokens_lock:
+        if _tokens.get(token.job) is token:
+            del _tokens[token.job]
+    if getattr(_local, "token", None) is token:
+        _local.token = None
+
+
+def token_atual():
+    """Token do job que roda na thread atual, ou None."""
+    return getattr(_local, "token", None)
+
+
+def cancelar(job):
+    """Pede o cancelamento do job. Retorna False se ele não tem token registrado."""
+    with _tokens_lock:
+        token = _tokens.get(job)
+    if token is None:
+        return False
+    token.cancelar()
+    return True
+
+
+# ----------------------------
+# Gancho entre segmentos do Whisper
+# ----------------------------
+_gancho_instalado = False
+_gancho_lock = threading.Lock()
+
+
+def instalar_gancho_whisper():
+    """
+    O transcribe do openai-whisper atualiza uma barra tqdm a cada janela de 30 s
+    decodificada (mesmo com a barra desligada). Troca o tqdm usado pelo módulo
+    whisper.transcribe por uma subclasse que, a cada atualização, consulta o
+    token da thread atual (interrompendo a transcrição entre segmentos) e
+    reaplica a cota de núcleos do job, que muda quando outras ATAs entram ou saem.
+    """
+    global _gancho_instalado
+    with _gancho_lock:
+        if _gancho_instalado:
+            return
+        import sys
+        import types
+        import tqdm
+        import whisper
+
+        # `whisper.transcribe` é a função (o __init__ faz `from .transcribe import transcribe`);
+        # o tqdm a trocar é o global do módulo, que a função lê em tempo de execução
+        modulo = sys.modules.get("whisper.transcribe")
+        funcao = getattr(whisper, "transcribe", None)
+        if (
+            modulo is None
+            or not isinstance(getattr(modulo, "tqdm", None), types.ModuleType)
+            or getattr(funcao, "__globals__", None) is not vars(modulo)
+        ):
+            logging.warning("Gancho de cancelamento do Whisper não instalado: whisper.transcribe não usa tqdm.tqdm.")
+            _gancho_instalado = True
+            return
+
+        class _TqdmCancelavel(tqdm.tqdm):
+            def update(self, n=1):
+                token = token_atual()
+                if token is not None:
+                    token.verificar()
+                    alocador_nucleos.aplicar(token.job)
+                return super().update(n)
+
+        modulo.tqdm = types.SimpleNamespace(tqdm=_TqdmCancelavel)
+        _gancho_instalado = True
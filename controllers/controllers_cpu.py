@@ -0,0 +1,74 @@
+# controllers_cpu.py
+import os
+import logging
+import threading
+
+# ----------------------------
+# Configuração (.env)
+# ----------------------------
+# Núcleos que as ATAs podem usar (padrão: todos os da máquina; vazio conta como não definido)
+CPU_NUCLEOS = int(os.getenv("CPU_NUCLEOS") or os.cpu_count() or 1)
+
+
+class AlocadorNucleos:
+    """
+    Divide os núcleos entre as ATAs em processamento para que as transcrições
+    simultâneas não disputem a CPU (cada uma usaria todos os núcleos por padrão).
+    Cada job recebe total // n núcleos (os primeiros ganham o resto). A cota é
+    recalculada quando um job entra ou sai e passa a valer no próximo `aplicar`
+    do job, chamado no início de cada etapa pesada (ffmpeg, transcrição) e, na
+    transcrição serial do openai-whisper, a cada janela de 30 s decodificada
+    (gancho do controllers_cancelamento): um job longo que começou sozinho cede
+    núcleos quando outro entra e os recupera quando ele sai.
+    """
+
+    def __init__(self, total=None):
+        self.total = max(1, total or CPU_NUCLEOS)
+        self._jobs = []
+        self._lock = threading.Lock()
+        self._local = threading.local()  # (job, cota) aplicados por último na thread (para o log)
+
+    def entrar(self, job_id):
+        with self._lock:
+            if job_id not in self._jobs:
+                self._jobs.append(job_id)
+            n = len(self._jobs)
+        logging.info(f"[{job_id}] Núcleos: {self.total} divididos entre {n} ATA(s).")
+
+    def sair(self, job_id):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs.remove(job_id)
+
+    def ativos(self):
+        with self._lock:
+            return len(self._jobs)
+
+    def cota(self, job_id=None):
+        """Núcleos deste job (sem `job_id` ou fora do alocador: a cota de um job novo)."""
+        with self._lock:
+            n = max(1, len(self._jobs))
+            i = self._jobs.index(job_id) if job_id in self._jobs else n - 1
+        base, resto = divmod(self.total, n)
+        return max(1, base + (1 if i < resto else 0))
+
+    def aplicar(self, job_id):
+        """
+        Ajusta o paralelismo intra-op do torch na thread do job e devolve a cota
+        (também usada no -threads do ffmpeg). Em builds OpenMP o número de
+        threads é uma configuração da thread que chama, então cada job tem a sua.
+        """
+        cota = self.cota(job_id)
+        try:
+            import torch
+            torch.set_num_threads(cota)
+        except ImportError:
+            pass
+        job_anterior, anterior = getattr(self._local, "cota", (None, None))
+        if job_anterior == job_id and anterior != cota:
+            logging.info(f"[{job_id}] Núcleos rebalanceados: {anterior} -> {cota}.")
+        self._local.cota = (job_id, cota)
+        return cota
+
+
+alocador_nucleos = AlocadorNucleos()
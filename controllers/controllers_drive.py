@@ -0,0 +1,148 @@
+# controllers_drive.py
+import os
+import json
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from google.auth.transport.requests import AuthorizedSession
+from googleapiclient.discovery import build
+
+# ----------------------------
+# Configuração do download (.env)
+# ----------------------------
+DRIVE_CHUNK_MB = int(os.getenv("DRIVE_CHUNK_MB", "8"))
+DRIVE_RANGES_PARALELOS = int(os.getenv("DRIVE_RANGES_PARALELOS", "4"))
+DRIVE_TENTATIVAS = int(os.getenv("DRIVE_TENTATIVAS", "3"))
+
+URL_MIDIA = "https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
+
+
+# ----------------------------
+# Diário de retomada
+# ----------------------------
+def _carregar_diario(caminho, esperado):
+    """Retorna os chunks já gravados, ou um conjunto vazio se o diário não bate com o arquivo atual."""
+    if not os.path.exists(caminho):
+        return set()
+    try:
+        with open(caminho, "r", encoding="utf-8") as f:
+            diario = json.load(f)
+        if any(diario.get(k) != v for k, v in esperado.items()):
+            return set()
+        return set(diario.get("concluidos", []))
+    except Exception as e:
+        logging.warning(f"Diário de download inválido ({caminho}): {e}")
+        return set()
+
+
+def _salvar_diario(caminho, esperado, concluidos):
+    tmp = caminho + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(dict(esperado, concluidos=sorted(concluidos)), f)
+    os.replace(tmp, caminho)
+
+
+# ----------------------------
+# Download paralelo por ranges
+# ----------------------------
+def descartar_parcial(destino):
+    """Remove o `.part` e o diário de um download interrompido."""
+    for caminho in (destino + ".part", destino + ".part.json"):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def baixar_arquivo_paralelo(creds, file_id, destino, chunk_mb=None, paralelos=None, tentativas=None,
+                            verificar=None):
+    """
+    Baixa um arquivo do Drive em vários ranges HTTP simultâneos.
+    Os bytes vão para `destino.part` e cada range concluído é registrado em
+    `destino.part.json`; se o processo cair, a próxima chamada baixa só o que falta.
+    `verificar` (opcional) é chamado antes de cada range e pode disparar uma
+    exceção para interromper o download (cancelamento).
+    """
+    chunk = (chunk_mb or DRIVE_CHUNK_MB) * 1024 * 1024
+    paralelos = max(1, paralelos or DRIVE_RANGES_PARALELOS)
+    tentativas = max(1, tentativas or DRIVE_TENTATIVAS)
+
+    service = build('drive', 'v3', credentials=creds)
+    meta = service.files().get(fileId=file_id, fields="size, md5Checksum").execute()
+    tamanho = int(meta.get('size', 0))
+
+    parcial = destino + ".part"
+    caminho_diario = parcial + ".json"
+    esperado = {
+        "file_id": file_id,
+        "tamanho": tamanho,
+        "md5": meta.get('md5Checksum'),
+        "chunk": chunk,
+    }
+
+    total_chunks = (tamanho + chunk - 1) // chunk
+    concluidos = _carregar_diario(caminho_diario, esperado)
+    if not concluidos and os.path.exists(parcial):
+        os.remove(parcial)  # parcial de outro arquivo/versão: recomeça do zero
+
+    # Pré-aloca o arquivo parcial para permitir escrita fora de ordem
+    with open(parcial, "ab") as fh:
+        if fh.tell() < tamanho:
+            fh.truncate(tamanho)
+
+    pendentes = [i for i in range(total_chunks) if i not in concluidos]
+    if concluidos:
+        logging.info(f"Retomando download de {file_id}: {len(concluidos)}/{total_chunks} ranges já baixados.")
+
+    url = URL_MIDIA.format(file_id=file_id)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def sessao():
+        # requests.Session não é thread-safe: uma sessão por thread
+        if not hasattr(local, "sessao"):
+            local.sessao = AuthorizedSession(creds)
+        return local.sessao
+
+    with open(parcial, "r+b") as fh:
+
+        def baixar_range(indice):
+            inicio = indice * chunk
+            fim = min(tamanho, inicio + chunk) - 1
+            if verificar:
+                verificar()
+            for tentativa in range(1, tentativas + 1):
+                try:
+                    resp = sessao().get(url, headers={"Range": f"bytes={inicio}-{fim}"}, timeout=120)
+                    resp.raise_for_status()
+                    dados = resp.content
+                    if len(dados) != fim - inicio + 1:
+                        raise IOError(f"range {inicio}-{fim} retornou {len(dados)} bytes")
+
+                    with lock:
+                        fh.seek(inicio)
+                        fh.write(dados)
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                        concluidos.add(indice)
+                        _salvar_diario(caminho_diario, esperado, concluidos)
+                    return
+                except Exception as e:
+                    logging.warning(f"Range {inicio}-{fim} de {file_id} falhou (tentativa {tentativa}/{tentativas}): {e}")
+                    if tentativa == tentativas:
+                        raise
+                    time.sleep(2 ** tentativa)
+
+        with ThreadPoolExecutor(max_workers=paralelos) as executor:
+            futuros = [executor.submit(baixar_range, i) for i in pendentes]
+            try:
+                for futuro in as_completed(futuros):
+                    futuro.result()
+            except BaseException:
+                for futuro in futuros:
+                    futuro.cancel()
+                raise
+
+    os.replace(parcial, destino)
+    if os.path.exists(caminho_diario):
+        os.remove(caminho_diario)
+    return destino
@@ -0,0 +1,180 @@
+# controllers_etapas.py
+import os
+import re
+import json
+import time
+import shutil
+import logging
+import threading
+
+# ----------------------------
+# Configuração (.env)
+# ----------------------------
+ATA_CHECKPOINT_DIR = os.getenv("ATA_CHECKPOINT_DIR", "checkpoints_ata")
+# Checkpoints de ATAs que falharam de vez: removidos após essa idade e acima desse total
+ATA_CHECKPOINT_MAX_DIAS = float(os.getenv("ATA_CHECKPOINT_MAX_DIAS", "7"))
+ATA_CHECKPOINT_MAX_MB = int(os.getenv("ATA_CHECKPOINT_MAX_MB", "2048"))
+
+# Etapas do processar_ata, na ordem em que rodam
+ETAPAS = ("localizar", "baixar", "extrair", "transcrever", "resumir", "gerar_docx")
+
+
+def _nome_pasta(texto):
+    return re.sub(r'[^a-zA-Z0-9._-]', '_', str(texto))
+
+
+# Pastas de manifestos abertos por jobs em andamento (a limpeza não mexe nelas)
+_em_uso = set()
+_em_uso_lock = threading.Lock()
+
+
+class ManifestoAta:
+    """
+    Checkpoints de uma ATA em ATA_CHECKPOINT_DIR/<usuário>/<event_id>/ (o mesmo
+    evento aparece para todos os participantes, cada um tem os seus): cada etapa
+    concluída grava o seu artefato nessa pasta e é registrada em manifesto.json
+    com os dados necessários para a próxima. Uma nova tentativa pula as etapas
+    registradas. Concluir (ou invalidar) uma etapa descarta as posteriores,
+    que dependiam do resultado anterior.
+    """
+
+    def __init__(self, event_id, usuario_email, pasta_base=None):
+        self.pasta = os.path.join(
+            pasta_base or ATA_CHECKPOINT_DIR, _nome_pasta(usuario_email), _nome_pasta(event_id)
+        )
+        self.caminho = os.path.join(self.pasta, "manifesto.json")
+        self.etapas = {}
+        self._lock = threading.Lock()
+        with _em_uso_lock:
+            _em_uso.add(os.path.abspath(self.pasta))
+        self._carregar()
+
+    def fechar(self):
+        """Fim do job: a pasta volta a poder ser removida pela limpeza de checkpoints antigos."""
+        with _em_uso_lock:
+            _em_uso.discard(os.path.abspath(self.pasta))
+
+    def concluida(self, etapa):
+        return etapa in self.etapas
+
+    def dados(self, etapa):
+        return self.etapas.get(etapa, {})
+
+    def ultima(self):
+        """Última etapa concluída (na ordem de ETAPAS), ou None."""
+        concluidas = [e for e in ETAPAS if e in self.etapas]
+        return concluidas[-1] if concluidas else None
+
+    def arquivo(self, nome):
+        """Caminho de um artefato dentro da pasta de checkpoints."""
+        os.makedirs(self.pasta, exist_ok=True)
+        return os.path.join(self.pasta, nome)
+
+    def concluir(self, etapa, **dados):
+        with self._lock:
+            self._descartar_depois(etapa)
+            self.etapas[etapa] = dados
+            self._salvar()
+
+    def invalidar(self, etapa):
+        """Descarta `etapa` e todas as posteriores."""
+        with self._lock:
+            self.etapas.pop(etapa, None)
+            self._descartar_depois(etapa)
+            self._salvar()
+
+    def limpar(self):
+        """Remove a pasta de checkpoints (ATA concluída)."""
+        self.etapas = {}
+        shutil.rmtree(self.pasta, ignore_errors=True)
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _descartar_depois(self, etapa):
+        for posterior in ETAPAS[ETAPAS.index(etapa) + 1:]:
+            self.etapas.pop(posterior, None)
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                self.etapas = json.load(f).get("etapas", {})
+        except Exception as e:
+            logging.warning(f"Manifesto de ATA inválido ({self.caminho}): {e}")
+            self.etapas = {}
+
+    def _salvar(self):
+        os.makedirs(self.pasta, exist_ok=True)
+        tmp = self.caminho + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"etapas": self.etapas}, f, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
+
+
+# ----------------------------
+# Limpeza de checkpoints abandonados
+# ----------------------------
+_ultima_limpeza = 0.0
+_limpeza_lock = threading.Lock()
+
+
+def _tamanho_pasta(pasta):
+    total = 0
+    for raiz, _, arquivos in os.walk(pasta):
+        for nome in arquivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nome))
+            except OSError:
+                pass
+    return total
+
+
+def limpar_checkpoints(pasta_base=None, max_dias=None, max_mb=None, intervalo_s=3600):
+    """
+    Remove checkpoints de ATAs que não foram retomadas: os mais velhos que
+    `max_dias` (pela última etapa gravada) e, se o total passar de `max_mb`,
+    os mais antigos até caber. Pastas de jobs em andamento ficam. Roda no
+    máximo uma vez por `intervalo_s`. Retorna quantas pastas removeu.
+    """
+    global _ultima_limpeza
+    with _limpeza_lock:
+        if _ultima_limpeza and time.monotonic() - _ultima_limpeza < intervalo_s:
+            return 0
+        _ultima_limpeza = time.monotonic()
+
+    base = pasta_base or ATA_CHECKPOINT_DIR
+    max_dias = ATA_CHECKPOINT_MAX_DIAS if max_dias is None else max_dias
+    max_bytes = (ATA_CHECKPOINT_MAX_MB if max_mb is None else max_mb) * 1024 * 1024
+    if not os.path.isdir(base):
+        return 0
+
+    with _em_uso_lock:
+        em_uso = set(_em_uso)
+    pastas = []
+    for usuario in os.listdir(base):
+        pasta_usuario = os.path.join(base, usuario)
+        if not os.path.isdir(pasta_usuario):
+            continue
+        for evento in os.listdir(pasta_usuario):
+            pasta = os.path.join(pasta_usuario, evento)
+            if not os.path.isdir(pasta) or os.path.abspath(pasta) in em_uso:
+                continue
+            manifesto = os.path.join(pasta, "manifesto.json")
+            idade = os.path.getmtime(manifesto if os.path.exists(manifesto) else pasta)
+            pastas.append((idade, _tamanho_pasta(pasta), pasta))
+
+    pastas.sort()  # mais antigas primeiro
+    limite_idade = time.time() - max_dias * 86400
+    total = sum(tamanho for _, tamanho, _ in pastas)
+    removidas = 0
+    for idade, tamanho, pasta in pastas:
+        if idade >= limite_idade and total <= max_bytes:
+            break
+        shutil.rmtree(pasta, ignore_errors=True)
+        total -= tamanho
+        removidas += 1
+    if removidas:
+        logging.info(f"Checkpoints de ATA: {removidas} pasta(s) antiga(s) removida(s).")
+    return removidas
@@ -0,0 +1,248 @@
+# controllers_fila.py
+import os
+import logging
+import functools
+import threading
+from collections import deque
+
+from controllers.controllers_usuario import processar_ata, ata_status
+from controllers.controllers_status import chave_job
+from controllers.controllers_cancelamento import criar_token, encerrar_token
+
+# ----------------------------
+# Configuração da fila (.env)
+# ----------------------------
+ATA_WORKERS = int(os.getenv("ATA_WORKERS", "1"))
+ATA_FILA_MAX = int(os.getenv("ATA_FILA_MAX", "20"))
+
+
+class FilaCheiaError(Exception):
+    """Disparada quando a fila de ATAs atingiu o limite configurado."""
+
+
+class AtaEmAndamentoError(Exception):
+    """Disparada quando a ATA já está na fila/rodando com outras opções (ex.: outro perfil)."""
+
+
+# ----------------------------
+# Agendador de ATAs
+# ----------------------------
+class AgendadorAtas:
+    """
+    Fila FIFO com número fixo de workers.
+    Cada job executa `funcao(event, creds, usuario_email, callback, **opcoes)`
+    e a posição na fila é publicada em `status[chave_job(usuario_email, event_id)]`.
+    Um pedido do mesmo usuário para um evento já na fila ou em processamento,
+    com as mesmas opções, não é enfileirado de novo: só se inscreve no job
+    existente e recebe o mesmo callback/resultado. O token de cancelamento do
+    job nasce no envio, então um cancelamento entre sair da fila e começar a
+    rodar não se perde.
+    """
+
+    def __init__(self, funcao, status, workers=None, max_fila=None):
+        self.funcao = funcao
+        self.status = status
+        self.workers = max(1, workers or ATA_WORKERS)
+        self.max_fila = max(1, max_fila or ATA_FILA_MAX)
+        self._fila = deque()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._ativos = 0
+        self._inscritos = {}  # chave_job -> pedido do job na fila/rodando (callbacks inscritos, opções)
+
+    def enviar(self, event, creds, usuario_email, callback=None, bloquear=False, timeout=None, **opcoes):
+        """
+        Coloca o evento na fila e retorna sua posição (1 = próximo a rodar).
+        Se o evento já está na fila, retorna a posição atual; se já está rodando, 0.
+        Com a fila cheia dispara FilaCheiaError, ou espera uma vaga se `bloquear=True`.
+        Se o job existente usa outras opções, dispara AtaEmAndamentoError.
+        """
+        event_id = event.get('id')
+        usuario_email = usuario_email() if callable(usuario_email) else str(usuario_email)
+        chave = chave_job(usuario_email, event_id)
+        with self._cond:
+            pedido = self._inscritos.get(chave)
+            if pedido is not None:
+                if pedido["token"].cancelado:
+                    raise AtaEmAndamentoError("ATA sendo cancelada; tente novamente em instantes.")
+                if pedido["opcoes"] != opcoes:
+                    raise AtaEmAndamentoError(
+                        "ATA já em processamento com outras opções; aguarde o término ou cancele antes."
+                    )
+                if callback:
+                    pedido["callbacks"].append(callback)
+                posicao = self._posicao(chave) or 0
+                logging.info(f"[{event_id}] ATA já em andamento; pedido anexado ao job existente.")
+                return posicao
+
+            if len(self._fila) >= self.max_fila:
+                if not bloquear:
+                    raise FilaCheiaError(f"Fila cheia ({self.max_fila} ATAs aguardando).")
+                if not self._cond.wait_for(lambda: len(self._fila) < self.max_fila, timeout):
+                    raise FilaCheiaError("Tempo esgotado aguardando vaga na fila.")
+
+            pedido = {
+                "chave": chave,
+                "callbacks": [callback] if callback else [],
+                "opcoes": opcoes,
+                "token": criar_token(chave),
+            }
+            self._inscritos[chave] = pedido
+            self._fila.append((pedido, event, creds, usuario_email))
+            self._iniciar_workers()
+            self._atualizar_posicoes()
+            self._cond.notify_all()
+            posicao = len(self._fila)
+
+        logging.info(f"[{event_id}] ATA enfileirada (posição {posicao}).")
+        return posicao
+
+    def cancelar(self, event_id, usuario_email, callback=None):
+        """
+        Cancela o pedido de `callback` (sem callback: o job inteiro). Se outros
+        pedidos continuam inscritos, só este sai do job e recebe o callback na
+        hora; o último a sair cancela o job: na fila, sai dela na hora; rodando,
+        é interrompido no próximo ponto seguro. Retorna False se não há job
+        (ou o callback não está inscrito nele).
+        """
+        chave = chave_job(usuario_email, event_id)
+        with self._cond:
+            pedido = self._inscritos.get(chave)
+            if pedido is None or (callback is not None and callback not in pedido["callbacks"]):
+                return False
+            desinscrito = callback is not None and len(pedido["callbacks"]) > 1
+            job = None if desinscrito else next((j for j in self._fila if j[0] is pedido), None)
+            if desinscrito:
+                pedido["callbacks"].remove(callback)
+            elif job is not None:
+                self._fila.remove(job)
+                self._encerrar_pedido(pedido)
+                self.status[chave] = {
+                    "ready": False,
+                    "erro": False,
+                    "cancelado": True,
+                    "mensagem": "Cancelado.",
+                    "usuario_email": chave[0],
+                }
+                self._atualizar_posicoes()
+                self._cond.notify_all()
+            else:
+                # Sob o lock: um pedido novo não se anexa a um job que está sendo cancelado
+                pedido["token"].cancelar()
+
+        if desinscrito:
+            logging.info(f"[{event_id}] Pedido retirado da ATA; o job segue para os demais inscritos.")
+            callback(event_id, None)
+        elif job is not None:
+            encerrar_token(pedido["token"])
+            logging.info(f"[{event_id}] ATA removida da fila (cancelada).")
+            for cb in pedido["callbacks"]:
+                cb(event_id, None)
+        return True
+
+    def posicao(self, event_id, usuario_email):
+        """Posição do evento na fila, ou None se não estiver aguardando."""
+        with self._cond:
+            return self._posicao(chave_job(usuario_email, event_id))
+
+    def em_andamento(self, event_id, usuario_email):
+        """True se o evento está na fila ou rodando para o usuário."""
+        with self._cond:
+            return chave_job(usuario_email, event_id) in self._inscritos
+
+    def pendentes(self):
+        with self._cond:
+            return len(self._fila)
+
+    def ativos(self):
+        with self._cond:
+            return self._ativos
+
+    def aguardar_ociosidade(self, timeout=None):
+        """Bloqueia até a fila esvaziar e nenhum job estar rodando."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._fila and self._ativos == 0, timeout)
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _posicao(self, chave):
+        for i, (pedido, *_) in enumerate(self._fila, start=1):
+            if pedido["chave"] == chave:
+                return i
+        return None
+
+    def _notificar(self, pedido, event_id, *args):
+        """
+        Callback único do job: repassa para todos os pedidos inscritos. No
+        resultado final (qualquer chamada fora do rascunho em refinamento) o job
+        deixa de aceitar inscrições sob o mesmo lock, então um pedido que chega
+        depois vira um job novo em vez de se anexar a um job já encerrado.
+        """
+        with self._cond:
+            callbacks = list(pedido["callbacks"])
+            if not self.status.get(pedido["chave"], {}).get("refinando"):
+                self._encerrar_pedido(pedido)
+        for callback in callbacks:
+            try:
+                callback(event_id, *args)
+            except Exception as e:
+                logging.error(f"[{event_id}] Falha no callback da ATA: {e}")
+
+    def _encerrar_pedido(self, pedido):
+        if self._inscritos.get(pedido["chave"]) is pedido:
+            del self._inscritos[pedido["chave"]]
+
+    def _iniciar_workers(self):
+        while len(self._threads) < self.workers:
+            t = threading.Thread(
+                target=self._worker,
+                name=f"ata-worker-{len(self._threads) + 1}",
+                daemon=True
+            )
+            self._threads.append(t)
+            t.start()
+
+    def _atualizar_posicoes(self):
+        for i, (pedido, *_) in enumerate(self._fila, start=1):
+            self.status[pedido["chave"]] = {
+                "ready": False,
+                "erro": False,
+                "posicao": i,
+                "mensagem": f"Na fila (posição {i})...",
+                "usuario_email": pedido["chave"][0],
+            }
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._fila)
+                pedido, event, creds, usuario_email = self._fila.popleft()
+                self._ativos += 1
+                self._atualizar_posicoes()
+                self._cond.notify_all()
+
+            try:
+                callback = functools.partial(self._notificar, pedido)
+                self.funcao(event, creds, usuario_email, callback, **pedido["opcoes"])
+            except Exception as e:
+                logging.error(f"[{event.get('id')}] Falha não tratada no worker: {e}")
+            finally:
+                encerrar_token(pedido["token"])
+                with self._cond:
+                    self._encerrar_pedido(pedido)
+                    self._ativos -= 1
+                    self._cond.notify_all()
+
+
+agendador = AgendadorAtas(processar_ata, ata_status)
+
+
+def enfileirar_ata(event, creds, usuario_email, callback=None, bloquear=False, **opcoes):
+    """Atalho para enviar uma ATA ao agendador global (opções vão para o processar_ata)."""
+    return agendador.enviar(event, creds, usuario_email, callback, bloquear=bloquear, **opcoes)
+
+
+def cancelar_ata(event_id, usuario_email, callback=None):
+    """Atalho para cancelar o pedido (ou a ATA inteira) no agendador global."""
+    return agendador.cancelar(event_id, usuario_email, callback)
@@ -0,0 +1,307 @@
+# controllers_status.py
+import os
+import json
+import time
+import atexit
+import socket
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from sqlalchemy import tuple_
+
+from models.models_usuario import get_db_session, AtaJob
+
+# ----------------------------
+# Configuração (.env)
+# ----------------------------
+# Máximo de jobs mantidos em memória (os concluídos mais antigos saem primeiro)
+STATUS_MAX_ENTRADAS = int(os.getenv("STATUS_MAX_ENTRADAS", "500"))
+# Intervalo entre gravações em lote na tabela ata_job
+STATUS_GRAVACAO_S = float(os.getenv("STATUS_GRAVACAO_S", "2"))
+# Job não finalizado sem gravação há mais que isso é considerado abandonado (instância encerrada)
+STATUS_ABANDONO_S = float(os.getenv("STATUS_ABANDONO_S", "120"))
+
+ESTADOS_FINAIS = ("concluido", "erro", "interrompido", "cancelado")
+
+# Instância que grava o job (host:pid): outras instâncias do app usam o mesmo banco
+PROCESSO = f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+# Campos do status que têm coluna própria em AtaJob; o resto vai para `detalhes`
+_COLUNAS = ("usuario_email", "perfil", "modelo", "tempo_transcricao", "docx_path", "resumo")
+_FORA_DE_DETALHES = set(_COLUNAS) | {"ready", "erro", "mensagem", "inicio", "fim", "estado"}
+
+
+def chave_job(usuario_email, event_id):
+    """
+    Chave de um job de ATA. O id do evento do Calendar é o mesmo para todos os
+    participantes da reunião, então cada usuário tem o seu job.
+    """
+    return (str(usuario_email), event_id)
+
+
+def estado_job(entrada):
+    """Estado do job a partir do dict de status."""
+    if entrada.get("estado") == "interrompido":
+        return "interrompido"
+    if entrada.get("cancelado"):
+        return "cancelado"
+    if entrada.get("erro") and not entrada.get("refinando"):
+        return "erro"
+    if entrada.get("ready") and not entrada.get("refinando"):
+        return "concluido"
+    if "posicao" in entrada:
+        return "fila"
+    return "processando"
+
+
+def _data(epoch):
+    return datetime.fromtimestamp(epoch) if epoch else None
+
+
+def _preencher(linha, job, entrada):
+    # As colunas da chave vêm só do job: o dict pode não trazer usuario_email (ex.: job na fila)
+    linha.usuario_email, linha.event_id = job
+    linha.estado = estado_job(entrada)
+    linha.processo = PROCESSO
+    linha.etapa = entrada.get("mensagem")
+    linha.erro = entrada.get("mensagem") if linha.estado in ("erro", "interrompido") else None
+    for campo in _COLUNAS:
+        if campo != "usuario_email":
+            setattr(linha, campo, entrada.get(campo))
+    linha.iniciado_em = _data(entrada.get("inicio"))
+    linha.concluido_em = _data(entrada.get("fim"))
+    linha.detalhes = json.dumps(
+        {k: v for k, v in entrada.items() if k not in _FORA_DE_DETALHES}, ensure_ascii=False, default=str
+    )
+    linha.atualizado_em = datetime.now()
+
+
+def _entrada_da_linha(linha):
+    entrada = json.loads(linha.detalhes) if linha.detalhes else {}
+    entrada.pop("posicao", None)
+    entrada.update({campo: getattr(linha, campo) for campo in _COLUNAS if getattr(linha, campo) is not None})
+    entrada.update({
+        "estado": linha.estado,
+        "ready": linha.estado == "concluido",
+        "erro": linha.estado in ("erro", "interrompido"),
+        "mensagem": linha.etapa or "",
+    })
+    if linha.iniciado_em:
+        entrada["inicio"] = linha.iniciado_em.timestamp()
+    if linha.concluido_em:
+        entrada["fim"] = linha.concluido_em.timestamp()
+    return entrada
+
+
+class EntradaStatus(dict):
+    """Dict de status de um job; qualquer alteração marca o job para a próxima gravação."""
+
+    def __init__(self, status, job, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._status = status
+        self._job = job
+
+    def __setitem__(self, chave, valor):
+        super().__setitem__(chave, valor)
+        self._status._marcar(self._job)
+
+    def __delitem__(self, chave):
+        super().__delitem__(chave)
+        self._status._marcar(self._job)
+
+    def update(self, *args, **kwargs):
+        super().update(*args, **kwargs)
+        self._status._marcar(self._job)
+
+    def pop(self, *args):
+        valor = super().pop(*args)
+        self._status._marcar(self._job)
+        return valor
+
+    def setdefault(self, chave, padrao=None):
+        if chave not in self:
+            self[chave] = padrao
+        return self[chave]
+
+
+class StatusAtas:
+    """
+    Status dos jobs de ATA: visão em memória, segura entre threads e limitada a
+    STATUS_MAX_ENTRADAS (saem os concluídos usados há mais tempo), persistida na
+    tabela ata_job. As alterações são gravadas em lote a cada STATUS_GRAVACAO_S
+    por uma thread própria, então os workers nunca esperam pelo banco.
+    Mantém a interface de dict usada pelo resto do app, com a chave de chave_job:
+    `status[job] = {...}`, `status[job]["mensagem"] = ...`, `status.get(...)`.
+    Os jobs em andamento são regravados a cada STATUS_ABANDONO_S / 4 para que
+    outras instâncias saibam que eles continuam vivos.
+    """
+
+    def __init__(self, max_entradas=None, intervalo_s=None):
+        self.max_entradas = max(1, max_entradas or STATUS_MAX_ENTRADAS)
+        self.intervalo_s = intervalo_s or STATUS_GRAVACAO_S
+        self._entradas = OrderedDict()
+        self._sujos = set()
+        self._lock = threading.RLock()
+        self._gravador = None
+        self._pulso = time.monotonic()
+        atexit.register(self.gravar_pendentes)
+
+    # ----------------------------
+    # Interface de dict
+    # ----------------------------
+    def __getitem__(self, job):
+        with self._lock:
+            return self._entradas[job]
+
+    def __setitem__(self, job, valor):
+        with self._lock:
+            self._entradas[job] = EntradaStatus(self, job, valor)
+            self._entradas.move_to_end(job)
+            self._marcar(job)
+            self._limitar()
+
+    def __contains__(self, job):
+        with self._lock:
+            return job in self._entradas
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entradas)
+
+    def get(self, job, padrao=None):
+        with self._lock:
+            return self._entradas.get(job, padrao)
+
+    def items(self):
+        with self._lock:
+            return list(self._entradas.items())
+
+    # ----------------------------
+    # Persistência
+    # ----------------------------
+    def carregar(self, usuario_email, event_ids):
+        """
+        Traz da tabela ata_job os jobs do usuário para `event_ids` que não estão
+        em memória e devolve {event_id: status}. Um job não finalizado volta como
+        "interrompido" se era desta instância ou se a instância dona parou de
+        gravá-lo (STATUS_ABANDONO_S); senão segue em processamento em outra
+        instância e só é mostrado, sem entrar na visão em memória.
+        """
+        usuario_email = str(usuario_email)
+        with self._lock:
+            faltando = [eid for eid in event_ids if chave_job(usuario_email, eid) not in self._entradas]
+        externos = {}
+        if faltando:
+            session = get_db_session()
+            try:
+                linhas = session.query(AtaJob).filter(
+                    AtaJob.usuario_email == usuario_email, AtaJob.event_id.in_(faltando)
+                ).all()
+            finally:
+                session.close()
+
+            limite = datetime.now() - timedelta(seconds=STATUS_ABANDONO_S)
+            with self._lock:
+                for linha in linhas:
+                    job = chave_job(usuario_email, linha.event_id)
+                    if job in self._entradas:
+                        continue
+                    entrada = _entrada_da_linha(linha)
+                    if linha.estado not in ESTADOS_FINAIS:
+                        abandonado = linha.atualizado_em is None or linha.atualizado_em < limite
+                        if linha.processo != PROCESSO and not abandonado:
+                            entrada["mensagem"] = f"Em processamento em outra instância do app ({linha.processo})."
+                            externos[linha.event_id] = entrada
+                            continue
+                        entrada.update({
+                            "estado": "interrompido",
+                            "erro": True,
+                            "mensagem": "Interrompido: o app foi encerrado durante o processamento.",
+                        })
+                        self._marcar(job)
+                    self._entradas[job] = EntradaStatus(self, job, entrada)
+                self._limitar()
+
+        with self._lock:
+            carregados = {
+                eid: dict.copy(self._entradas[chave_job(usuario_email, eid)])
+                for eid in event_ids if chave_job(usuario_email, eid) in self._entradas
+            }
+        carregados.update(externos)
+        return carregados
+
+    def gravar_pendentes(self):
+        """Grava os jobs alterados desde a última gravação. Retorna quantos foram gravados."""
+        with self._lock:
+            pendentes = {job: dict.copy(self._entradas[job]) for job in self._sujos if job in self._entradas}
+            self._sujos.clear()
+        if not pendentes:
+            return 0
+
+        session = get_db_session()
+        try:
+            linhas = {
+                (linha.usuario_email, linha.event_id): linha
+                for linha in session.query(AtaJob).filter(
+                    tuple_(AtaJob.usuario_email, AtaJob.event_id).in_(list(pendentes))
+                )
+            }
+            for job, entrada in pendentes.items():
+                linha = linhas.get(job)
+                if linha is None:
+                    linha = AtaJob()
+                    session.add(linha)
+                _preencher(linha, job, entrada)
+            session.commit()
+            return len(pendentes)
+        except Exception as e:
+            session.rollback()
+            logging.warning(f"Falha ao gravar status das ATAs ({len(pendentes)} jobs): {e}")
+            with self._lock:
+                self._sujos.update(pendentes)
+            return 0
+        finally:
+            session.close()
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _marcar(self, job):
+        with self._lock:
+            self._sujos.add(job)
+            if self._gravador is None:
+                self._gravador = threading.Thread(target=self._gravar_periodicamente, name="status-atas", daemon=True)
+                self._gravador.start()
+
+    def _limitar(self):
+        """Remove os jobs finalizados mais antigos (já gravados) acima do limite."""
+        excesso = len(self._entradas) - self.max_entradas
+        if excesso <= 0:
+            return
+        for job in list(self._entradas):
+            if excesso <= 0:
+                break
+            entrada = self._entradas[job]
+            if job not in self._sujos and estado_job(entrada) in ESTADOS_FINAIS:
+                del self._entradas[job]
+                excesso -= 1
+
+    def _pulsar(self):
+        """Marca os jobs em andamento para regravação (mantém atualizado_em recente)."""
+        if time.monotonic() - self._pulso < STATUS_ABANDONO_S / 4:
+            return
+        self._pulso = time.monotonic()
+        with self._lock:
+            self._sujos.update(
+                job for job, entrada in self._entradas.items() if estado_job(entrada) not in ESTADOS_FINAIS
+            )
+
+    def _gravar_periodicamente(self):
+        while True:
+            time.sleep(self.intervalo_s)
+            self._pulsar()
+            self.gravar_pendentes()
+            with self._lock:
+                self._limitar()
@@ -0,0 +1,529 @@
+# controllers_transcricao.py
+import os
+import re
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+
+from controllers.controllers_whisper import modelo_whisper, WHISPER_MODELO, RTF_ESTIMADO, WHISPER_OCIOSO_MIN
+from controllers.controllers_cpu import CPU_NUCLEOS
+from controllers.controllers_cancelamento import token_atual, instalar_gancho_whisper
+
+SAMPLE_RATE = 16000
+
+# ----------------------------
+# Configuração da transcrição paralela (.env)
+# ----------------------------
+TRANSCRICAO_PARALELA = os.getenv("TRANSCRICAO_PARALELA", "0") == "1"
+TRANSCRICAO_PROCESSOS = int(os.getenv("TRANSCRICAO_PROCESSOS", str(max(1, (os.cpu_count() or 2) // 2))))
+JANELA_SEGUNDOS = int(os.getenv("TRANSCRICAO_JANELA_S", "300"))
+SOBREPOSICAO_SEGUNDOS = int(os.getenv("TRANSCRICAO_SOBREPOSICAO_S", "5"))
+
+# Backend de transcrição: "whisper" (openai-whisper) ou "faster-whisper" (CTranslate2)
+TRANSCRICAO_BACKEND = os.getenv("TRANSCRICAO_BACKEND", "whisper")
+FASTER_WHISPER_MODELO = os.getenv("FASTER_WHISPER_MODELO", WHISPER_MODELO)
+FASTER_WHISPER_COMPUTE = os.getenv("FASTER_WHISPER_COMPUTE", "int8")
+TRANSCRICAO_PERFIL = os.getenv("TRANSCRICAO_PERFIL", "padrao")
+
+# Escolha do modelo pelo prazo: maior modelo que termina dentro de TRANSCRICAO_PRAZO_MIN
+TRANSCRICAO_ADAPTATIVA = os.getenv("TRANSCRICAO_ADAPTATIVA", "0") == "1"
+TRANSCRICAO_PRAZO_MIN = float(os.getenv("TRANSCRICAO_PRAZO_MIN", "30"))
+TRANSCRICAO_MODELOS = [
+    m.strip() for m in os.getenv("TRANSCRICAO_MODELOS", "tiny,base,small,medium").split(",") if m.strip()
+]
+TRANSCRICAO_RTF_ARQUIVO = os.getenv("TRANSCRICAO_RTF_ARQUIVO", "rtf_modelos.json")
+
+# Duas passadas: rascunho com um modelo pequeno logo de início, versão final depois
+TRANSCRICAO_RASCUNHO = os.getenv("TRANSCRICAO_RASCUNHO", "0") == "1"
+TRANSCRICAO_MODELO_RASCUNHO = os.getenv("TRANSCRICAO_MODELO_RASCUNHO", "tiny")
+
+# ----------------------------
+# Perfis de velocidade
+# ----------------------------
+# Opções de decodificação do transcribe. A cascata de temperaturas e o
+# condition_on_previous_text são o que mais pesa em áudio difícil: cada
+# fallback decodifica o trecho de novo. "padrao" repete os defaults do
+# whisper.transcribe (o comportamento de antes dos perfis) e é o perfil padrão;
+# os demais mudam o texto gerado e precisam ser escolhidos explicitamente.
+PERFIS_TRANSCRICAO = {
+    "padrao": {
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "beam_size": None,
+        "best_of": None,
+        "condition_on_previous_text": True,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+    },
+    "rapido": {
+        "temperature": 0.0,
+        "beam_size": None,
+        "best_of": None,
+        "condition_on_previous_text": False,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+    },
+    "equilibrado": {
+        "temperature": (0.0, 0.4, 0.8),
+        "beam_size": None,
+        "best_of": 2,
+        "condition_on_previous_text": False,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+    },
+    "preciso": {
+        "temperature": (0.0, 0.2, 0.4, 0.6, 0.8, 1.0),
+        "beam_size": 5,
+        "best_of": 5,
+        "condition_on_previous_text": True,
+        "compression_ratio_threshold": 2.4,
+        "logprob_threshold": -1.0,
+        "no_speech_threshold": 0.6,
+    },
+}
+
+
+def opcoes_perfil(perfil=None):
+    """Opções do perfil (padrão TRANSCRICAO_PERFIL), sem as chaves desligadas (None)."""
+    perfil = perfil or TRANSCRICAO_PERFIL
+    if perfil not in PERFIS_TRANSCRICAO:
+        raise ValueError(f"Perfil de transcrição '{perfil}' não suportado.")
+    return {k: v for k, v in PERFIS_TRANSCRICAO[perfil].items() if v is not None}
+
+# ----------------------------
+# Worker (roda em outro processo)
+# ----------------------------
+_modelo_worker = None
+
+
+def _iniciar_worker(modelo, threads):
+    """
+    Cada processo do pool carrega o modelo uma única vez. Com WHISPER_CARGA=mmap
+    os pesos são páginas do mesmo arquivo, compartilhadas entre os workers.
+    """
+    global _modelo_worker
+    import torch
+    from controllers.controllers_whisper import carregar_modelo
+    torch.set_num_threads(threads)
+    _modelo_worker = carregar_modelo(modelo)
+
+
+def _transcrever_janela(tarefa):
+    inicio_s, audio_janela, opcoes = tarefa
+    result = _modelo_worker.transcribe(audio_janela, **opcoes)
+    return [
+        {"start": seg["start"] + inicio_s, "end": seg["end"] + inicio_s, "text": seg["text"]}
+        for seg in result.get("segments", [])
+    ]
+
+
+# ----------------------------
+# Janelas e costura
+# ----------------------------
+def dividir_janelas(audio, janela_s=JANELA_SEGUNDOS, sobreposicao_s=SOBREPOSICAO_SEGUNDOS):
+    """Divide o áudio em janelas fixas de `janela_s` com `sobreposicao_s` de sobreposição."""
+    janela = int(janela_s * SAMPLE_RATE)
+    passo = max(1, janela - int(sobreposicao_s * SAMPLE_RATE))
+    janelas = []
+    inicio = 0
+    while True:
+        janelas.append((inicio / SAMPLE_RATE, audio[inicio:inicio + janela]))
+        if inicio + janela >= len(audio):
+            break
+        inicio += passo
+    return janelas
+
+
+def _normalizar(texto):
+    return re.sub(r"[^\w]+", " ", texto.lower()).strip()
+
+
+def costurar_segmentos(resultados, janelas):
+    """
+    Junta os segmentos das janelas em uma linha do tempo única.
+    Na sobreposição entre duas janelas o corte fica no ponto médio: cada segmento
+    é mantido apenas pela janela que contém o seu centro, e um segmento repetido
+    logo na emenda (mesmo texto) é descartado.
+    """
+    finais = []
+    for i, segmentos in enumerate(resultados):
+        inicio_janela = janelas[i][0]
+        fim_janela = inicio_janela + len(janelas[i][1]) / SAMPLE_RATE
+
+        corte_inicio = inicio_janela
+        if i > 0:
+            fim_anterior = janelas[i - 1][0] + len(janelas[i - 1][1]) / SAMPLE_RATE
+            corte_inicio = (inicio_janela + fim_anterior) / 2
+
+        corte_fim = fim_janela
+        if i + 1 < len(janelas):
+            corte_fim = (janelas[i + 1][0] + fim_janela) / 2
+
+        for seg in segmentos:
+            centro = (seg["start"] + seg["end"]) / 2
+            if i > 0 and centro < corte_inicio:
+                continue
+            if i + 1 < len(janelas) and centro >= corte_fim:
+                continue
+            if finais and _normalizar(finais[-1]["text"]) == _normalizar(seg["text"]) \
+                    and seg["start"] <= finais[-1]["end"] + SOBREPOSICAO_SEGUNDOS:
+                continue
+            finais.append(seg)
+    return finais
+
+
+# ----------------------------
+# Transcrição paralela
+# ----------------------------
+_pools = {}  # (modelo, processos) -> [pool, jobs usando, último uso (monotonic)]
+_pool_atual = None
+_pools_lock = threading.Lock()
+_pools_monitor = None
+
+
+def _encerrar_pools_ociosos():
+    """
+    Encerra os pools sem jobs que não são o atual e, como o RegistroModelos faz
+    com os modelos, também o atual sem uso há mais de WHISPER_OCIOSO_MIN: cada
+    worker mantém uma cópia do modelo na memória. Chamar com _pools_lock.
+    """
+    global _pool_atual
+    agora = time.monotonic()
+    for config, (pool, em_uso, ultimo_uso) in list(_pools.items()):
+        if em_uso:
+            continue
+        ocioso = WHISPER_OCIOSO_MIN > 0 and agora - ultimo_uso > WHISPER_OCIOSO_MIN * 60
+        if config != _pool_atual or ocioso:
+            pool.shutdown(wait=False)
+            del _pools[config]
+            if config == _pool_atual:
+                _pool_atual = None
+                logging.info(f"Pool de transcrição paralela ({config[0]}, {config[1]} processos) encerrado por ociosidade.")
+
+
+def _monitorar_pools():
+    while True:
+        time.sleep(min(60, WHISPER_OCIOSO_MIN * 60))
+        with _pools_lock:
+            _encerrar_pools_ociosos()
+
+
+@contextmanager
+def _usar_pool(modelo, processos):
+    """
+    Pool de processos do modelo, compartilhado pelas ATAs simultâneas e contado
+    por referência: ao trocar de modelo/processos, um pool antigo só é encerrado
+    quando nenhum job está mais enviando janelas para ele. Os workers nascem com
+    "spawn": o fork depois de torch/OpenMP inicializados no processo pai não é seguro.
+    """
+    global _pool_atual, _pools_monitor
+    config = (modelo, processos)
+    with _pools_lock:
+        _pool_atual = config
+        if _pools_monitor is None and WHISPER_OCIOSO_MIN > 0:
+            _pools_monitor = threading.Thread(target=_monitorar_pools, name="pool-ocioso", daemon=True)
+            _pools_monitor.start()
+        if config not in _pools:
+            threads = max(1, CPU_NUCLEOS // processos)
+            pool = ProcessPoolExecutor(
+                max_workers=processos,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_iniciar_worker,
+                initargs=(modelo, threads)
+            )
+            _pools[config] = [pool, 0, time.monotonic()]
+            novo = True
+        else:
+            novo = False
+        _pools[config][1] += 1
+        _encerrar_pools_ociosos()
+        pool = _pools[config][0]
+    try:
+        yield pool, novo
+    finally:
+        with _pools_lock:
+            _pools[config][1] -= 1
+            _pools[config][2] = time.monotonic()
+            _encerrar_pools_ociosos()
+
+
+def transcrever_paralelo(audio, modelo, processos=None, janela_s=JANELA_SEGUNDOS,
+                         sobreposicao_s=SOBREPOSICAO_SEGUNDOS, **opcoes):
+    """
+    Transcreve `audio` (float32 16 kHz) em janelas sobrepostas usando um pool de
+    processos, cada um com o seu modelo. Retorna {"text", "segments", "tempo",
+    "pool_novo"}; com pool_novo o tempo inclui subir os processos e carregar o modelo.
+    """
+    processos = max(1, processos or TRANSCRICAO_PROCESSOS)
+    janelas = dividir_janelas(audio, janela_s, sobreposicao_s)
+
+    t0 = time.perf_counter()
+    with _usar_pool(modelo, processos) as (pool, pool_novo):
+        futuros = [pool.submit(_transcrever_janela, (inicio, trecho, opcoes)) for inicio, trecho in janelas]
+
+        # Cancelamento entre janelas: as que ainda não começaram são descartadas
+        token = token_atual()
+        resultados = []
+        try:
+            for futuro in futuros:
+                resultados.append(futuro.result())
+                if token:
+                    token.verificar()
+        except BaseException:
+            for futuro in futuros:
+                futuro.cancel()
+            raise
+    segmentos = costurar_segmentos(resultados, janelas)
+    tempo = time.perf_counter() - t0
+
+    logging.info(
+        f"Transcrição paralela: {len(janelas)} janelas, {processos} processos, "
+        f"{len(audio) / SAMPLE_RATE:.0f}s de áudio em {tempo:.1f}s"
+    )
+    texto = " ".join(seg["text"].strip() for seg in segmentos)
+    return {"text": texto, "segments": segmentos, "tempo": tempo, "pool_novo": pool_novo}
+
+
+# ----------------------------
+# Real-time factor medido e escolha do modelo
+# ----------------------------
+class MedidorRTF:
+    """
+    Real-time factor por modelo, perfil e modo (serial/paralelo): média móvel
+    exponencial das transcrições feitas nesta máquina, persistida em
+    TRANSCRICAO_RTF_ARQUIVO. Só entra o tempo de decodificação (modelo já
+    carregado, pool já de pé). Sem medição, vale o RTF_ESTIMADO do controllers_whisper.
+    """
+
+    def __init__(self, caminho=None, peso=0.3):
+        self.caminho = caminho or TRANSCRICAO_RTF_ARQUIVO
+        self.peso = peso
+        self._medidos = {}
+        self._lock = threading.Lock()
+        self._carregar()
+
+    @staticmethod
+    def _chave(nome, perfil, paralelo):
+        return f"{nome}|{perfil or TRANSCRICAO_PERFIL}|{'paralelo' if paralelo else 'serial'}"
+
+    def rtf(self, nome, perfil=None, paralelo=False):
+        with self._lock:
+            return self._medidos.get(self._chave(nome, perfil, paralelo), RTF_ESTIMADO.get(nome, 1.0))
+
+    def registrar(self, nome, tempo_s, duracao_s, perfil=None, paralelo=False):
+        if duracao_s <= 0:
+            return
+        medida = tempo_s / duracao_s
+        chave = self._chave(nome, perfil, paralelo)
+        with self._lock:
+            anterior = self._medidos.get(chave)
+            self._medidos[chave] = medida if anterior is None else anterior + self.peso * (medida - anterior)
+            self._salvar()
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho):
+            return
+        try:
+            with open(self.caminho, "r", encoding="utf-8") as f:
+                self._medidos = {k: float(v) for k, v in json.load(f).items()}
+        except Exception as e:
+            logging.warning(f"Medições de RTF inválidas ({self.caminho}): {e}")
+
+    def _salvar(self):
+        try:
+            tmp = self.caminho + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(self._medidos, f)
+            os.replace(tmp, self.caminho)
+        except OSError as e:
+            logging.warning(f"Não foi possível salvar as medições de RTF: {e}")
+
+
+medidor_rtf = MedidorRTF()
+
+
+def _usa_paralelo(duracao_s):
+    return TRANSCRICAO_PARALELA and duracao_s > JANELA_SEGUNDOS
+
+
+def escolher_modelo(duracao_s, fila=0, workers=1, prazo_min=None, candidatos=None, perfil=None):
+    """
+    Maior modelo de `candidatos` cuja transcrição estimada (duração x RTF do
+    perfil e do modo que o áudio vai usar) cabe no prazo. Cada ATA na fila
+    também espera por esta, então o prazo é dividido entre esta e as `fila`
+    que aguardam atrás dela nos `workers`.
+    Retorna (modelo, estimativa_s, orcamento_s); sem nenhum que caiba, o menor.
+    """
+    prazo_s = (prazo_min if prazo_min is not None else TRANSCRICAO_PRAZO_MIN) * 60
+    candidatos = candidatos or TRANSCRICAO_MODELOS
+    orcamento_s = prazo_s / (1 + fila / max(1, workers))
+    paralelo = _usa_paralelo(duracao_s)
+
+    def estimativa(nome):
+        return duracao_s * medidor_rtf.rtf(nome, perfil, paralelo)
+
+    # Do menor para o maior, pela ordem do RTF estimado
+    ordenados = sorted(candidatos, key=lambda m: RTF_ESTIMADO.get(m, 1.0))
+    escolhido = ordenados[0]
+    for nome in ordenados:
+        if estimativa(nome) <= orcamento_s:
+            escolhido = nome
+    return escolhido, estimativa(escolhido), orcamento_s
+
+
+# ----------------------------
+# Backends de transcrição
+# ----------------------------
+def _resultado(segmentos):
+    segmentos = [{"start": float(seg["start"]), "end": float(seg["end"]), "text": seg["text"]} for seg in segmentos]
+    return {"text": " ".join(seg["text"].strip() for seg in segmentos), "segments": segmentos}
+
+
+class BackendTranscricao(ABC):
+    """
+    Contrato único dos motores de transcrição: áudio float32 16 kHz entra,
+    {"text", "segments": [{"start", "end", "text"}]} sai. `perfil` escolhe as
+    opções de decodificação em PERFIS_TRANSCRICAO. `modelo` pede um tamanho
+    específico (ver escolher_modelo); backends com modelo fixo o ignoram.
+    """
+    nome = ""
+    adaptativo = False
+
+    @abstractmethod
+    def transcrever(self, audio, language='pt', perfil=None, modelo=None):
+        """Transcreve `audio` e devolve {"text", "segments"}."""
+
+    def aquecer(self):
+        """Inicia a carga do modelo em background, se o backend suportar."""
+
+    def pronto(self):
+        return True
+
+    def descricao(self):
+        return f"Transcrição: {self.nome}"
+
+
+class BackendWhisper(BackendTranscricao):
+    """openai-whisper, com o modelo do RegistroModelos e a transcrição paralela opcional."""
+    nome = "whisper"
+    adaptativo = True
+
+    def __init__(self, gerenciador=None):
+        self.gerenciador = gerenciador or modelo_whisper
+
+    def transcrever(self, audio, language='pt', perfil=None, modelo=None):
+        opcoes = opcoes_perfil(perfil)
+        nome = modelo or self.gerenciador.nome
+        duracao_s = len(audio) / SAMPLE_RATE
+        paralelo = _usa_paralelo(duracao_s)
+        if token_atual():
+            instalar_gancho_whisper()  # cancelamento entre segmentos
+        if paralelo:
+            result = transcrever_paralelo(audio, self.gerenciador.registro.origem(nome), language=language, **opcoes)
+            # Pool recém-criado: o tempo inclui subir os processos e carregar o modelo neles
+            tempo = None if result["pool_novo"] else result["tempo"]
+        else:
+            with self.gerenciador.registro.usar(nome) as m:
+                # Cronômetro depois de obter o modelo: a carga a frio não entra no RTF
+                t0 = time.perf_counter()
+                result = m.transcribe(audio, language=language, **opcoes)
+                tempo = time.perf_counter() - t0
+        if tempo is not None:
+            medidor_rtf.registrar(nome, tempo, duracao_s, perfil=perfil, paralelo=paralelo)
+        return _resultado(result.get("segments", []))
+
+    def aquecer(self):
+        self.gerenciador.aquecer()
+
+    def pronto(self):
+        return self.gerenciador.pronto()
+
+    def descricao(self):
+        return self.gerenciador.descricao()
+
+
+class BackendFasterWhisper(BackendTranscricao):
+    """
+    faster-whisper (CTranslate2): mesmo modelo Whisper convertido, com kernels
+    int8 de CPU. Dependência opcional: pip install faster-whisper.
+    """
+    nome = "faster-whisper"
+
+    def __init__(self, modelo=None, compute_type=None):
+        self.modelo_nome = modelo or FASTER_WHISPER_MODELO
+        self.compute_type = compute_type or FASTER_WHISPER_COMPUTE
+        self.estado = "não carregado"
+        self._modelo = None
+        self._lock = threading.Lock()
+
+    def _obter(self):
+        with self._lock:
+            if self._modelo is None:
+                self.estado = "carregando"
+                try:
+                    from faster_whisper import WhisperModel
+                    self._modelo = WhisperModel(self.modelo_nome, device="cpu", compute_type=self.compute_type)
+                    self.estado = "pronto"
+                except Exception as e:
+                    self.estado = f"erro ({e})"
+                    raise
+            return self._modelo
+
+    def transcrever(self, audio, language='pt', perfil=None, modelo=None):
+        opcoes = opcoes_perfil(perfil)
+        # Mesmo perfil, nomes do faster-whisper (greedy = beam_size 1)
+        opcoes["log_prob_threshold"] = opcoes.pop("logprob_threshold", None)
+        opcoes.setdefault("beam_size", 1)
+        if isinstance(opcoes["temperature"], float):
+            opcoes["temperature"] = [opcoes["temperature"]]
+        segmentos, _ = self._obter().transcribe(audio, language=language, **opcoes)
+        # `segmentos` é um gerador: a decodificação acontece durante a iteração,
+        # então o cancelamento é verificado entre um segmento e outro
+        token = token_atual()
+        finais = []
+        for seg in segmentos:
+            if token:
+                token.verificar()
+            finais.append({"start": seg.start, "end": seg.end, "text": seg.text})
+        return _resultado(finais)
+
+    def aquecer(self):
+        threading.Thread(target=self._aquecer, name="faster-whisper-loader", daemon=True).start()
+
+    def _aquecer(self):
+        try:
+            self._obter()
+        except Exception as e:
+            logging.error(f"Falha ao carregar faster-whisper: {e}")
+
+    def pronto(self):
+        return self._modelo is not None
+
+    def descricao(self):
+        return f"Modelo faster-whisper ({self.modelo_nome}, {self.compute_type}): {self.estado}"
+
+
+BACKENDS = {
+    BackendWhisper.nome: BackendWhisper,
+    BackendFasterWhisper.nome: BackendFasterWhisper,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def obter_backend(nome=None):
+    """Instância única do backend configurado em TRANSCRICAO_BACKEND (ou `nome`)."""
+    nome = nome or TRANSCRICAO_BACKEND
+    if nome not in BACKENDS:
+        raise ValueError(f"Backend de transcrição '{nome}' não suportado.")
+    with _backends_lock:
+        if nome not in _backends:
+            _backends[nome] = BACKENDS[nome]()
+        return _backends[nome]
@@ -1,20 +1,35 @@
 import os
-import io
 import json
 import subprocess
 import logging
 import re
-import sys
+import threading
+import time
 import unicodedata
+import numpy as np
 from datetime import datetime, timedelta
 from dateutil import parser as date_parser
 from docx import Document
 from werkzeug.utils import secure_filename
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload
+from googleapiclient.errors import HttpError
 from google.oauth2.credentials import Credentials
 from models.models_usuario import get_db_session, Usuario
-import whisper
+from controllers.controllers_whisper import modelo_whisper, origem_modelo, WHISPER_INT8, RTF_ESTIMADO
+from controllers.controllers_drive import baixar_arquivo_paralelo, descartar_parcial, DRIVE_CHUNK_MB
+from controllers.controllers_transcricao import (
+    obter_backend, escolher_modelo, TRANSCRICAO_BACKEND, TRANSCRICAO_PERFIL, FASTER_WHISPER_MODELO,
+    TRANSCRICAO_PARALELA, JANELA_SEGUNDOS, SOBREPOSICAO_SEGUNDOS,
+    TRANSCRICAO_ADAPTATIVA, TRANSCRICAO_MODELOS, TRANSCRICAO_RASCUNHO, TRANSCRICAO_MODELO_RASCUNHO
+)
+from controllers.controllers_cache import chave_cache, ler_cache, gravar_cache
+from controllers.controllers_cpu import alocador_nucleos
+from controllers.controllers_status import StatusAtas, chave_job
+from controllers.controllers_etapas import ManifestoAta, limpar_checkpoints
+from controllers.controllers_cancelamento import AtaCancelada, iniciar_token, encerrar_token, token_atual
+from controllers.controllers_vad import SAMPLE_RATE, VAD_ATIVO, parametros_vad, aplicar_vad, remapear_segmentos
+from controllers.controllers_agenda import eh_reuniao_meet, buscar_eventos
 
 # ----------------------------
 # Logger
@@ -28,41 +43,33 @@ logging.basicConfig(
 )
 
 # ----------------------------
-# Whisper - inicialização segura
+# Configuração do pipeline (.env)
 # ----------------------------
-try:
-    # Detecta se está rodando empacotado com PyInstaller
-    if getattr(sys, 'frozen', False):
-        base_path = sys._MEIPASS
-    else:
-        base_path = os.path.abspath(".")
-
-    modelo_path = os.path.join(base_path, "small.pt")
-
-    logging.info(f"Carregando modelo Whisper de: {modelo_path}")
-
-    if os.path.exists(modelo_path):
-        whisper_model = whisper.load_model(modelo_path)
-    else:
-        whisper_model = whisper.load_model("small")
+# 1 = envia os chunks do Drive direto para o stdin do ffmpeg (sem gravar o .mp4)
+DRIVE_STREAMING = os.getenv("DRIVE_STREAMING", "1") == "1"
+# 1 = além do áudio em memória, mantém o .wav 16 kHz na pasta do usuário
+MANTER_WAV = os.getenv("MANTER_WAV", "0") == "1"
 
-    logging.info("Modelo Whisper carregado com sucesso.")
-except Exception as e:
-    logging.error(f"Falha ao carregar modelo Whisper: {e}")
-    whisper_model = None
+# ----------------------------
+# Whisper - carregado em background (ver controllers_whisper)
+# ----------------------------
+# Origem do modelo padrão (arquivo local ou nome), reutilizada pela transcrição paralela e pelo cache
+whisper_modelo_origem = modelo_whisper.origem
 
 # ----------------------------
-# Status de processamento de ATA
+# Status de processamento de ATA (persistido na tabela ata_job)
 # ----------------------------
-ata_status = {}
+ata_status = StatusAtas()
 
-def log_status(event_id, mensagem, erro=False):
-    ata_status[event_id]["mensagem"] = mensagem
+def log_status(job, mensagem, erro=False):
+    """Atualiza a mensagem do job (chave_job: usuário + evento) e registra no log."""
+    ata_status[job]["mensagem"] = mensagem
+    usuario_email, event_id = job
     if erro:
-        ata_status[event_id]["erro"] = True
-        logging.error(f"[{event_id}] {mensagem}")
+        ata_status[job]["erro"] = True
+        logging.error(f"[{event_id}] [{usuario_email}] {mensagem}")
     else:
-        logging.info(f"[{event_id}] {mensagem}")
+        logging.info(f"[{event_id}] [{usuario_email}] {mensagem}")
 
 # ----------------------------
 # Usuário
@@ -191,38 +198,17 @@ def carregar_credenciais_usuario(user_id):
 # ----------------------------
 # Google Calendar / Drive
 # ----------------------------
-def listar_reunioes(creds):
+def listar_reunioes(creds, time_min=None, time_max=None):
+    """Reuniões do Meet no período [time_min, time_max], pedindo só os campos usados pelo app."""
     service = build('calendar', 'v3', credentials=creds)
-    all_events = []
-    page_token = None
-    while True:
-        events_result = service.events().list(
-            calendarId='primary',
-            maxResults=2500,
-            singleEvents=True,
-            orderBy='startTime',
-            pageToken=page_token
-        ).execute()
-        events = events_result.get('items', [])
-        all_events.extend(events)
-        page_token = events_result.get('nextPageToken')
-        if not page_token:
-            break
-
-    meet_events = [
-        e for e in all_events
-        if 'hangoutLink' in e or (e.get('conferenceData') and e['conferenceData'].get('entryPoints'))
-    ]
-    return meet_events
+    all_events, _ = buscar_eventos(service, time_min=time_min, time_max=time_max)
+    meet_events = [e for e in all_events if eh_reuniao_meet(e)]
+    return sorted(meet_events, key=lambda e: e['start'].get('dateTime') or e['start'].get('date') or "")
 
 def baixar_video_drive(creds, file_id, destino):
-    service = build('drive', 'v3', credentials=creds)
-    request = service.files().get_media(fileId=file_id)
-    with io.FileIO(destino, 'wb') as fh:
-        downloader = MediaIoBaseDownload(fh, request)
-        done = False
-        while not done:
-            _, done = downloader.next_chunk()
+    """Download paralelo por ranges, retomável e cancelável entre chunks (ver controllers_drive)."""
+    token = token_atual()
+    return baixar_arquivo_paralelo(creds, file_id, destino, verificar=token.verificar if token else None)
 
 # ----------------------------
 # Limpeza de nomes de arquivos
@@ -286,6 +272,135 @@ def extrair_audio_ffmpeg(video_path, audio_path):
         raise
 
 
+# ----------------------------
+# Áudio em memória (PCM float32)
+# ----------------------------
+def _comando_ffmpeg_pcm(entrada, wav_path=None, threads=None):
+    """Decodifica para PCM 16 kHz mono no stdout; opcionalmente grava também um .wav."""
+    cmd = ["ffmpeg", "-y"]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd += [
+        "-i", entrada,
+        "-vn", "-acodec", "pcm_s16le",
+        "-ar", "16000", "-ac", "1",
+        "-f", "s16le", "pipe:1"
+    ]
+    if wav_path:
+        cmd += [
+            "-vn", "-acodec", "pcm_s16le",
+            "-ar", "16000", "-ac", "1",
+            "-f", "wav", wav_path
+        ]
+    return cmd
+
+
+def _pcm_para_float32(dados):
+    # Mesmo formato de whisper.load_audio: float32 em [-1, 1]
+    return np.frombuffer(dados, np.int16).flatten().astype(np.float32) / 32768.0
+
+
+def carregar_audio_pcm(video_path, wav_path=None, threads=None):
+    """
+    Decodifica o vídeo direto para um array float32 16 kHz, pronto para o transcribe.
+    O .wav só é gravado se `wav_path` for informado.
+    """
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Vídeo não encontrado: {video_path}")
+
+    # Popen registrado no token do job: cancelar a ATA encerra o ffmpeg
+    token = token_atual()
+    proc = subprocess.Popen(
+        _comando_ffmpeg_pcm(video_path, wav_path, threads),
+        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    if token:
+        token.registrar_processo(proc)
+    try:
+        dados, _ = proc.communicate()
+    finally:
+        if token:
+            token.remover_processo(proc)
+    if token:
+        token.verificar()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, "ffmpeg")
+    return _pcm_para_float32(dados)
+
+
+class _StdinFFmpeg:
+    """Adaptador file-like: o MediaIoBaseDownload escreve e o ffmpeg lê pelo stdin."""
+
+    def __init__(self, proc):
+        self.proc = proc
+
+    def write(self, dados):
+        self.proc.stdin.write(dados)
+        return len(dados)
+
+
+def extrair_audio_drive_streaming(creds, file_id, wav_path=None, threads=None):
+    """
+    Baixa o vídeo do Drive em chunks e entrega cada chunk ao ffmpeg pelo stdin,
+    lendo o PCM decodificado pelo stdout. Nenhum .mp4 vai para o disco e o .wav
+    só é gravado se `wav_path` for informado.
+    """
+    service = build('drive', 'v3', credentials=creds)
+    request = service.files().get_media(fileId=file_id)
+
+    proc = subprocess.Popen(
+        _comando_ffmpeg_pcm("pipe:0", wav_path, threads),
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+    )
+    token = token_atual()
+    if token:
+        token.registrar_processo(proc)
+    erros = []
+
+    def alimentar_ffmpeg():
+        try:
+            downloader = MediaIoBaseDownload(_StdinFFmpeg(proc), request, chunksize=DRIVE_CHUNK_MB * 1024 * 1024)
+            done = False
+            while not done and not (token and token.cancelado):
+                _, done = downloader.next_chunk()
+        except BrokenPipeError:
+            # ffmpeg encerrou antes do fim do download: o código de saída decide se foi falha
+            pass
+        except Exception as e:
+            erros.append(e)
+        finally:
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+
+    alimentador = threading.Thread(target=alimentar_ffmpeg, daemon=True)
+    alimentador.start()
+    dados = proc.stdout.read()
+    retorno = proc.wait()
+    alimentador.join()
+    if token:
+        token.remover_processo(proc)
+
+    if erros or retorno != 0 or (token and token.cancelado):
+        if wav_path and os.path.exists(wav_path):
+            os.remove(wav_path)
+        if token:
+            token.verificar()
+        if erros:
+            raise erros[0]
+        raise subprocess.CalledProcessError(retorno, "ffmpeg (streaming)")
+
+    if not dados:
+        # MP4 com o índice (moov) no final: pelo stdin o ffmpeg não faz seek,
+        # consome tudo e sai com código 0 sem decodificar nada
+        if wav_path and os.path.exists(wav_path):
+            os.remove(wav_path)
+        raise RuntimeError("ffmpeg não decodificou áudio pelo stdin (MP4 sem faststart?)")
+
+    return _pcm_para_float32(dados)
+
+
 # ----------------------------
 # Buscar senha (exemplo)
 # ----------------------------
@@ -322,113 +437,505 @@ def gerar_resumo_texto(texto):
 # ----------------------------
 # Processamento de ATA com Whisper
 # ----------------------------
-def processar_ata(event, creds, usuario_email, callback=None):
-    event_id = event.get('id')
-    ata_status[event_id] = {"ready": False, "erro": False, "mensagem": "Iniciando..."}
-
+def _salvar_audio_checkpoint(manifesto, audio):
+    """Grava o áudio como PCM int16 (o mesmo que o ffmpeg produziu, sem perda)."""
+    caminho = manifesto.arquivo("audio.npy")
+    tmp = caminho + ".tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, np.clip(audio * 32768.0, -32768, 32767).astype(np.int16))
+    os.replace(tmp, caminho)
+    manifesto.concluir("extrair", arquivo="audio.npy")
+
+
+def _obter_audio(job, creds, video_file, user_folder, manifesto):
+    """
+    Baixa o vídeo do Drive e devolve o áudio decodificado (float32 16 kHz).
+    Com as etapas "baixar"/"extrair" no manifesto, reaproveita o vídeo ou o áudio já obtidos.
+    """
+    # --- Checkpoint: áudio já extraído numa tentativa anterior ---
+    if manifesto.concluida("extrair"):
+        caminho_audio = manifesto.arquivo(manifesto.dados("extrair")["arquivo"])
+        if os.path.exists(caminho_audio):
+            log_status(job, "Áudio recuperado do checkpoint (download e extração pulados).")
+            return np.load(caminho_audio).astype(np.float32) / 32768.0
+        manifesto.invalidar("extrair")
+
+    # --- Checkpoint: vídeo já baixado numa tentativa anterior ---
+    nome_video = manifesto.dados("baixar").get("arquivo")
+    video_baixado = bool(nome_video) and os.path.exists(nome_video)
+
+    # --- Limpeza e padronização do nome ---
+    nome_original = os.path.splitext(video_file['name'])[0]
+    nome_limpo = limpar_nome_arquivo(nome_original)
+    extensao_video = os.path.splitext(video_file['name'])[1] or ".mp4"
+
+    audio_file = os.path.join(user_folder, f"{nome_limpo}.wav")
+    if not video_baixado:
+        nome_video = os.path.join(user_folder, f"{nome_limpo}{extensao_video}")
+
+        # --- Evita sobrescritas automáticas ---
+        contador = 1
+        while os.path.exists(nome_video) or os.path.exists(audio_file):
+            nome_video = os.path.join(user_folder, f"{nome_limpo}_{contador}{extensao_video}")
+            audio_file = os.path.join(user_folder, f"{nome_limpo}_{contador}.wav")
+            contador += 1
+
+        # --- Logs ---
+        log_status(job, f"Baixando vídeo do Drive: {video_file['name']}")
+        log_status(job, f"Salvando como: {os.path.basename(nome_video)}")
+
+    # --- Download + decodificação em streaming (sem .mp4 no disco) ---
+    audio = None
+    wav_manter = audio_file if MANTER_WAV else None
+    threads = alocador_nucleos.aplicar(job)
+    if DRIVE_STREAMING and not video_baixado:
+        log_status(job, "Baixando e decodificando áudio em streaming...")
+        try:
+            audio = extrair_audio_drive_streaming(creds, video_file['id'], wav_manter, threads)
+            manifesto.concluir("baixar", arquivo=None, streaming=True)
+        except AtaCancelada:
+            raise
+        except Exception as e_stream:
+            log_status(job, f"Streaming indisponível ({e_stream}). Baixando o vídeo completo...")
+
+    if audio is None:
+        # --- Download seguro do vídeo ---
+        try:
+            if video_baixado:
+                log_status(job, f"Vídeo recuperado do checkpoint: {os.path.basename(nome_video)}")
+            else:
+                baixar_video_drive(creds, video_file['id'], nome_video)
+                manifesto.concluir("baixar", arquivo=nome_video)
+
+            # --- Decodificação do áudio em memória ---
+            log_status(job, f"Decodificando áudio de: {nome_video}")
+            audio = carregar_audio_pcm(nome_video, wav_manter, alocador_nucleos.aplicar(job))
+        except AtaCancelada:
+            # Cancelada: descarta o download parcial e o vídeo/wav incompletos
+            descartar_parcial(nome_video)
+            for arquivo in (nome_video, wav_manter):
+                if arquivo and os.path.exists(arquivo):
+                    os.remove(arquivo)
+            raise
+
+    _salvar_audio_checkpoint(manifesto, audio)
+
+    # (Opcional) Remove o .mp4 após extração, para economizar espaço
+    if nome_video and os.path.exists(nome_video):
+        try:
+            os.remove(nome_video)
+            log_status(job, "Vídeo removido após extração para liberar espaço.")
+        except Exception as e_rm:
+            log_status(job, f"Falha ao remover vídeo: {e_rm}")
+
+    return audio
+
+
+def _opcoes_transcricao(perfil):
+    """Opções que influenciam o texto gerado (fazem parte da chave do cache)."""
+    opcoes = {"language": "pt", "backend": TRANSCRICAO_BACKEND, "perfil": perfil}
+    if TRANSCRICAO_BACKEND == "whisper":
+        opcoes.update({"paralela": TRANSCRICAO_PARALELA, "int8": WHISPER_INT8})
+        if TRANSCRICAO_PARALELA:
+            opcoes["janela_s"] = JANELA_SEGUNDOS
+            opcoes["sobreposicao_s"] = SOBREPOSICAO_SEGUNDOS
+    else:
+        opcoes["modelo"] = FASTER_WHISPER_MODELO
+    if VAD_ATIVO:
+        opcoes["vad"] = parametros_vad()
+    return opcoes
+
+
+def _chaves_cache(video_file, perfil):
+    """
+    Chaves de cache candidatas, da melhor para a pior. Com a escolha adaptativa
+    qualquer tamanho de TRANSCRICAO_MODELOS pode ter gerado a transcrição.
+    """
+    opcoes = _opcoes_transcricao(perfil)
+    if not (TRANSCRICAO_ADAPTATIVA and TRANSCRICAO_BACKEND == "whisper"):
+        return [chave_cache(video_file, whisper_modelo_origem, opcoes)]
+    nomes = sorted(set(TRANSCRICAO_MODELOS) | {modelo_whisper.nome}, key=lambda m: -RTF_ESTIMADO.get(m, 1.0))
+    return [chave_cache(video_file, origem_modelo(nome), opcoes) for nome in nomes]
+
+
+def _escolher_modelo(job, backend, audio, perfil):
+    """Modelo para esta ATA pelo prazo configurado e pela fila atual (None = padrão do backend)."""
+    if not (TRANSCRICAO_ADAPTATIVA and backend.adaptativo):
+        return None
+    # Import tardio: controllers_fila importa este módulo
+    from controllers.controllers_fila import agendador
+    duracao = len(audio) / SAMPLE_RATE
+    modelo, estimativa_s, orcamento_s = escolher_modelo(
+        duracao, fila=agendador.pendentes(), workers=agendador.workers, perfil=perfil
+    )
+    ata_status[job].update({
+        "modelo": modelo,
+        "estimativa_s": round(estimativa_s),
+        "orcamento_s": round(orcamento_s),
+    })
+    log_status(
+        job,
+        f"Modelo escolhido: {modelo} (estimativa {estimativa_s / 60:.0f} min, "
+        f"prazo {orcamento_s / 60:.0f} min com {agendador.pendentes()} na fila)"
+    )
+    return modelo
+
+
+def _preparar_audio(job, audio):
+    """
+    Pré-passo de voz: remove silêncio, tela compartilhada sem fala e sala de
+    espera. Retorna (audio, mapa) para remapear os tempos depois (mapa None = sem VAD).
+    """
+    if not VAD_ATIVO:
+        return audio, None
+    duracao = len(audio) / SAMPLE_RATE
+    audio, mapa, economia_s = aplicar_vad(audio)
+    ata_status[job]["silencio_removido_s"] = round(economia_s, 1)
+    log_status(job, f"Detecção de voz: {economia_s:.0f}s de silêncio removidos de {duracao:.0f}s.")
+    return audio, mapa
+
+
+def _transcrever_audio(job, audio, mapa, perfil, modelo=None):
+    if not len(audio):
+        return {"text": "", "segments": []}
+
+    # --- Transcrição (backend configurado em TRANSCRICAO_BACKEND) ---
+    backend = obter_backend()
+    if not backend.pronto():
+        log_status(job, "Aguardando o modelo de transcrição carregar...")
+
+    nucleos = alocador_nucleos.aplicar(job)
+    ata_status[job]["nucleos"] = nucleos
+    log_status(job, f"Transcrevendo áudio (perfil {perfil}{f', modelo {modelo}' if modelo else ''}, {nucleos} núcleos)...")
+    t0 = time.perf_counter()
+    result = backend.transcrever(audio, language='pt', perfil=perfil, modelo=modelo)
+
+    if mapa is not None:
+        result["segments"] = remapear_segmentos(result["segments"], mapa)
+        # Tempo economizado estimado com a velocidade medida nesta transcrição
+        rtf = (time.perf_counter() - t0) / max(len(audio) / SAMPLE_RATE, 1e-6)
+        ata_status[job]["tempo_economizado_s"] = round(ata_status[job]["silencio_removido_s"] * rtf, 1)
+    return result
+
+
+def _salvar_docx(event, caminho, resumo, transcricao, linha_transcricao):
+    """
+    Monta a ATA e grava em `caminho` (substituição atômica: o rascunho é trocado
+    no lugar). Retorna o caminho realmente gravado: se o arquivo está bloqueado
+    (no Windows, rascunho aberto no Word), a ATA vai para `<nome>_final.docx`.
+    """
+    doc = Document()
+    doc.add_heading('ATA DE REUNIÃO', 0)
+    doc.add_paragraph(f"Data: {datetime.today().strftime('%d/%m/%Y')}")
+    doc.add_paragraph(f"Reunião: {event.get('summary', '')}")
+    doc.add_paragraph(linha_transcricao)
+    doc.add_heading('Resumo', level=1)
+    doc.add_paragraph(resumo)
+    doc.add_heading('Transcrição', level=1)
+    doc.add_paragraph(transcricao)
+
+    tmp = caminho + ".tmp.docx"
+    doc.save(tmp)
     try:
-        usuario_email = usuario_email() if callable(usuario_email) else str(usuario_email)
-        user_folder = get_user_upload_folder(usuario_email)
-        log_status(event_id, "Baixando vídeo do Google Drive...")
-
-        transcricao = ""
+        os.replace(tmp, caminho)
+        return caminho
+    except PermissionError as e:
+        base, extensao = os.path.splitext(caminho)
+        alternativo = f"{base}_final{extensao}"
+        logging.warning(f"Não foi possível substituir {caminho} ({e}); gravando em {alternativo}.")
+        os.replace(tmp, alternativo)
+        return alternativo
+
+
+def _usar_rascunho(backend, modelo):
+    modelo_final = modelo or modelo_whisper.nome
+    return TRANSCRICAO_RASCUNHO and backend.adaptativo and modelo_final != TRANSCRICAO_MODELO_RASCUNHO
+
+
+def _publicar_rascunho(event, job, audio, mapa, caminho, callback):
+    """
+    Primeira passada com o modelo pequeno e o perfil rápido: a ATA provisória
+    (status, resumo e DOCX) fica disponível enquanto a passada final roda.
+    """
+    log_status(job, f"Gerando rascunho com o modelo {TRANSCRICAO_MODELO_RASCUNHO}...")
+    try:
+        result = _transcrever_audio(job, audio, mapa, "rapido", modelo=TRANSCRICAO_MODELO_RASCUNHO)
+        texto = result.get('text', '')
+        resumo = gerar_resumo_texto(texto)
+        caminho = _salvar_docx(
+            event, caminho, resumo, texto,
+            f"Transcrição: RASCUNHO (modelo {TRANSCRICAO_MODELO_RASCUNHO}) - versão final em andamento"
+        )
+    except AtaCancelada:
+        raise
+    except Exception as e:
+        log_status(job, f"Rascunho indisponível ({e}); seguindo com a transcrição final.")
+        return
 
-        if creds:
-            service = build('drive', 'v3', credentials=creds)
-            data_evento = date_parser.parse(event['start']['dateTime']).date()
-
-            # Busca vídeos ±1 dia (para compensar fuso horário)
-            inicio = (data_evento - timedelta(days=1)).strftime("%Y-%m-%dT00:00:00")
-            fim = (data_evento + timedelta(days=1)).strftime("%Y-%m-%dT23:59:59")
-
-            query = (
-                f"mimeType='video/mp4' and createdTime >= '{inicio}' "
-                f"and createdTime <= '{fim}'"
-            )
-
-            results = service.files().list(
-                q=query,
-                pageSize=1,
-                orderBy='createdTime desc',
-                fields="files(id, name)"
-            ).execute()
-            files = results.get('files', [])
-
-            if files:
-                video_file = files[0]
-
-                # --- Limpeza e padronização do nome ---
-                nome_original = os.path.splitext(video_file['name'])[0]
-                nome_limpo = limpar_nome_arquivo(nome_original)
-                extensao_video = os.path.splitext(video_file['name'])[1] or ".mp4"
-
-                nome_video = os.path.join(user_folder, f"{nome_limpo}{extensao_video}")
-                audio_file = os.path.join(user_folder, f"{nome_limpo}.wav")
-
-                # --- Evita sobrescritas automáticas ---
-                contador = 1
-                while os.path.exists(nome_video) or os.path.exists(audio_file):
-                    nome_video = os.path.join(user_folder, f"{nome_limpo}_{contador}{extensao_video}")
-                    audio_file = os.path.join(user_folder, f"{nome_limpo}_{contador}.wav")
-                    contador += 1
-
-                # --- Logs ---
-                log_status(event_id, f"Baixando vídeo do Drive: {video_file['name']}")
-                log_status(event_id, f"Salvando como: {os.path.basename(nome_video)}")
-
-                # --- Download seguro do vídeo ---
-                baixar_video_drive(creds, video_file['id'], nome_video)
+    ata_status[job].update({
+        "ready": True, "rascunho": True, "refinando": True, "resumo": resumo, "docx_path": caminho
+    })
+    log_status(job, "Rascunho pronto. Refinando a transcrição...")
+    if callback:
+        callback(event.get('id'), caminho)
 
-                # --- Extração de áudio ---
-                log_status(event_id, f"Extraindo áudio de: {nome_video} → {audio_file}")
-                extrair_audio_ffmpeg(nome_video, audio_file)
 
-                # (Opcional) Remove o .mp4 após extração, para economizar espaço
-                try:
-                    os.remove(nome_video)
-                    log_status(event_id, "Vídeo removido após extração para liberar espaço.")
-                except Exception as e_rm:
-                    log_status(event_id, f"Falha ao remover vídeo: {e_rm}")
+def _gravacao_inalterada(service, video_file):
+    """True se o arquivo do checkpoint ainda está no Drive com o mesmo conteúdo (md5/tamanho)."""
+    try:
+        atual = service.files().get(fileId=video_file['id'], fields="id, md5Checksum, size, trashed").execute()
+    except HttpError as e:
+        if e.resp.status == 404:
+            return False
+        raise
+    if atual.get('trashed'):
+        return False
+    return all(atual.get(campo) == video_file.get(campo) for campo in ("md5Checksum", "size") if video_file.get(campo))
 
-                # --- Transcrição com Whisper ---
-                if whisper_model is None:
-                    raise RuntimeError("O modelo Whisper não foi carregado corretamente.")
 
-                log_status(event_id, "Transcrevendo áudio...")
-                result = whisper_model.transcribe(audio_file, language='pt')
-                transcricao = result.get('text', '')
+def _localizar_gravacao(job, event, creds, manifesto):
+    """
+    Etapa "localizar": gravação do Meet no Drive (id, nome, md5, tamanho) ou None.
+    A gravação do checkpoint é conferida no Drive antes de ser reaproveitada.
+    """
+    service = build('drive', 'v3', credentials=creds)
+    if manifesto.concluida("localizar"):
+        video_file = manifesto.dados("localizar").get("video_file")
+        if video_file and _gravacao_inalterada(service, video_file):
+            return video_file
+        log_status(job, "A gravação do checkpoint mudou ou saiu do Drive; buscando de novo...")
+        manifesto.invalidar("localizar")
+    data_evento = date_parser.parse(event['start']['dateTime']).date()
+
+    # Busca vídeos ±1 dia (para compensar fuso horário)
+    inicio = (data_evento - timedelta(days=1)).strftime("%Y-%m-%dT00:00:00")
+    fim = (data_evento + timedelta(days=1)).strftime("%Y-%m-%dT23:59:59")
+
+    query = (
+        f"mimeType='video/mp4' and createdTime >= '{inicio}' "
+        f"and createdTime <= '{fim}'"
+    )
 
-            else:
-                transcricao = "Nenhum vídeo encontrado no Google Drive para este evento."
-        else:
-            transcricao = "Transcrição simulada (sem credenciais Google)."
+    results = service.files().list(
+        q=query,
+        pageSize=1,
+        orderBy='createdTime desc',
+        fields="files(id, name, md5Checksum, size)"
+    ).execute()
+    files = results.get('files', [])
+
+    video_file = files[0] if files else None
+    if video_file:
+        manifesto.concluir("localizar", video_file=video_file)
+    return video_file
+
+
+# Single-flight por gravação: id do arquivo no Drive -> (job que está transcrevendo, Event de término)
+_gravacoes_em_andamento = {}
+_gravacoes_lock = threading.Lock()
+
+
+def _liderar_gravacao(job, file_id):
+    """
+    True se este job passa a ser o responsável pela gravação `file_id`. Se outro
+    evento já a está transcrevendo, espera ele terminar (espelhando o progresso
+    dele no status) e retorna False: o chamador consulta o cache de novo.
+    """
+    with _gravacoes_lock:
+        voo = _gravacoes_em_andamento.get(file_id)
+        if voo is None:
+            _gravacoes_em_andamento[file_id] = (job, threading.Event())
+            return True
+
+    lider, terminado = voo
+    ultima = None
+    alocador_nucleos.sair(job)  # esperando não usa CPU: os núcleos ficam para os outros jobs
+    try:
+        while not terminado.wait(1):
+            token = token_atual()
+            if token:
+                token.verificar()
+            mensagem = ata_status.get(lider, {}).get("mensagem")
+            if mensagem != ultima:
+                log_status(job, f"Mesma gravação em processamento por outra ATA: {mensagem}")
+                ultima = mensagem
+    finally:
+        alocador_nucleos.entrar(job)
+    return False
+
+
+def _liberar_gravacao(file_id):
+    with _gravacoes_lock:
+        _, terminado = _gravacoes_em_andamento.pop(file_id)
+    terminado.set()
+
+
+def _transcrever_gravacao(event, job, creds, video_file, user_folder, perfil, caminho, callback, manifesto):
+    """
+    Etapa "transcrever" (com "baixar"/"extrair" antes, se preciso).
+    Retorna (texto, tempo_transcricao); tempo None quando veio do cache/checkpoint.
+    """
+    opcoes = _opcoes_transcricao(perfil)
+    if manifesto.concluida("transcrever"):
+        dados = manifesto.dados("transcrever")
+        if dados.get("opcoes") == opcoes and os.path.exists(manifesto.arquivo(dados["arquivo"])):
+            log_status(job, "Transcrição recuperada do checkpoint.")
+            with open(manifesto.arquivo(dados["arquivo"]), "r", encoding="utf-8") as f:
+                return json.load(f).get('text', ''), None
+        manifesto.invalidar("transcrever")
+
+    # --- Cache de transcrição (mesma gravação, modelo e opções) ---
+    # Outra ATA transcrevendo a mesma gravação: espera e lê o resultado dela do cache
+    chaves = _chaves_cache(video_file, perfil)
+    while True:
+        em_cache = next((c for c in map(ler_cache, chaves) if c), None)
+        if em_cache:
+            log_status(job, "Transcrição encontrada no cache.")
+            return em_cache.get('text', ''), None
+        if _liderar_gravacao(job, video_file['id']):
+            break
 
-        # --- Geração do resumo e DOCX ---
-        resumo = gerar_resumo_texto(transcricao)
-        ata_status[event_id]["resumo"] = resumo
+    try:
+        return _transcrever_nova(event, job, creds, video_file, user_folder, perfil, caminho, callback, manifesto)
+    finally:
+        _liberar_gravacao(video_file['id'])
+
+
+def _transcrever_nova(event, job, creds, video_file, user_folder, perfil, caminho, callback, manifesto):
+    """Baixa, extrai e transcreve a gravação (sem cache), registrando as etapas no manifesto."""
+    opcoes = _opcoes_transcricao(perfil)
+    audio = _obter_audio(job, creds, video_file, user_folder, manifesto)
+    audio, mapa = _preparar_audio(job, audio)
+
+    backend = obter_backend()
+    modelo = _escolher_modelo(job, backend, audio, perfil) if len(audio) else None
+
+    # --- Modo duas passadas: rascunho rápido primeiro, versão final depois ---
+    if len(audio) and _usar_rascunho(backend, modelo):
+        _publicar_rascunho(event, job, audio, mapa, caminho, callback)
+
+    t0 = time.perf_counter()
+    result = _transcrever_audio(job, audio, mapa, perfil, modelo)
+    tempo_transcricao = time.perf_counter() - t0
+    ata_status[job]["tempo_transcricao"] = round(tempo_transcricao, 1)
+    transcricao = result.get('text', '')
+    segmentos = [
+        {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+        for seg in result.get('segments', [])
+    ]
+    origem = origem_modelo(modelo) if modelo else whisper_modelo_origem
+    # Transcrição vazia não vai para o cache compartilhado: pode vir de um áudio
+    # que falhou em silêncio e seria servida a todos os participantes
+    if transcricao.strip():
+        gravar_cache(chave_cache(video_file, origem, opcoes), transcricao, segmentos)
+
+    with open(manifesto.arquivo("transcricao.json"), "w", encoding="utf-8") as f:
+        json.dump({"text": transcricao, "segments": segmentos}, f, ensure_ascii=False)
+    manifesto.concluir("transcrever", arquivo="transcricao.json", opcoes=opcoes)
+    return transcricao, tempo_transcricao
+
+
+def processar_ata(event, creds, usuario_email, callback=None, perfil=None):
+    """
+    Gera a ATA do evento em etapas com checkpoint (ver ManifestoAta): localizar
+    a gravação, baixar, extrair o áudio, transcrever, resumir e gerar o DOCX.
+    Se uma tentativa falhar, a próxima recomeça da última etapa concluída.
+    """
+    event_id = event.get('id')
+    usuario_email = usuario_email() if callable(usuario_email) else str(usuario_email)
+    job = chave_job(usuario_email, event_id)
+    perfil = perfil or TRANSCRICAO_PERFIL
+    ata_status[job] = {
+        "ready": False, "erro": False, "mensagem": "Iniciando...", "perfil": perfil, "inicio": time.time(),
+        "usuario_email": usuario_email,
+    }
+    alocador_nucleos.entrar(job)
+    manifesto = ManifestoAta(event_id, usuario_email)
+    token = iniciar_token(job)
 
-        log_status(event_id, "Gerando DOCX...")
-        doc = Document()
-        doc.add_heading('ATA DE REUNIÃO', 0)
-        doc.add_paragraph(f"Data: {datetime.today().strftime('%d/%m/%Y')}")
-        doc.add_paragraph(f"Reunião: {event.get('summary', '')}")
-        doc.add_heading('Resumo', level=1)
-        doc.add_paragraph(resumo)
-        doc.add_heading('Transcrição', level=1)
-        doc.add_paragraph(transcricao)
+    try:
+        try:
+            limpar_checkpoints()
+        except OSError as e:
+            logging.warning(f"Falha ao limpar checkpoints antigos: {e}")
+        user_folder = get_user_upload_folder(usuario_email)
+        if manifesto.ultima():
+            log_status(job, f"Retomando após a etapa '{manifesto.ultima()}' da tentativa anterior...")
+        else:
+            log_status(job, "Baixando vídeo do Google Drive...")
 
+        transcricao = ""
+        tempo_transcricao = None
         caminho = os.path.join(
             user_folder,
             f'ata_{event_id}_{datetime.now().strftime("%H%M%S")}.docx'
         )
-        doc.save(caminho)
 
-        ata_status[event_id].update({"ready": True, "mensagem": f"Concluído! Arquivo: {caminho}"})
+        if creds:
+            video_file = _localizar_gravacao(job, event, creds, manifesto)
+            token.verificar()
+            if video_file:
+                transcricao, tempo_transcricao = _transcrever_gravacao(
+                    event, job, creds, video_file, user_folder, perfil, caminho, callback, manifesto
+                )
+            else:
+                transcricao = "Nenhum vídeo encontrado no Google Drive para este evento."
+        else:
+            transcricao = "Transcrição simulada (sem credenciais Google)."
+
+        token.verificar()
 
+        # --- Resumo (etapa "resumir") ---
+        if manifesto.concluida("resumir"):
+            with open(manifesto.arquivo("resumo.txt"), "r", encoding="utf-8") as f:
+                resumo = f.read()
+        else:
+            resumo = gerar_resumo_texto(transcricao)
+            if manifesto.concluida("transcrever"):
+                with open(manifesto.arquivo("resumo.txt"), "w", encoding="utf-8") as f:
+                    f.write(resumo)
+                manifesto.concluir("resumir", arquivo="resumo.txt")
+
+        # --- DOCX (etapa "gerar_docx"; substitui o rascunho, se houver) ---
+        log_status(job, "Gerando DOCX...")
+        if tempo_transcricao is not None:
+            economizado = ata_status[job].get("tempo_economizado_s")
+            extra = f" ({economizado:.0f}s economizados pulando silêncio)" if economizado else ""
+            modelo = ata_status[job].get("modelo")
+            perfil_modelo = f"perfil {perfil}, modelo {modelo}" if modelo else f"perfil {perfil}"
+            linha_transcricao = f"Transcrição: {perfil_modelo}, {tempo_transcricao:.0f}s{extra}"
+        else:
+            linha_transcricao = f"Transcrição: perfil {perfil} (cache)"
+        caminho = _salvar_docx(event, caminho, resumo, transcricao, linha_transcricao)
+
+        # ATA pronta: os checkpoints não são mais necessários
+        manifesto.limpar()
+
+        ata_status[job].update({
+            "ready": True,
+            "rascunho": False,
+            "refinando": False,
+            "resumo": resumo,
+            "docx_path": caminho,
+            "mensagem": f"Concluído! Arquivo: {caminho}",
+        })
+
+    except AtaCancelada:
+        # Cancelamento explícito: nada a retomar, descarta os checkpoints
+        manifesto.limpar()
+        ata_status[job].update({"cancelado": True, "refinando": False})
+        log_status(job, "Cancelado pelo usuário.")
     except Exception as e:
-        log_status(event_id, f"Erro ao processar ATA: {e}", erro=True)
+        ata_status[job]["refinando"] = False
+        etapa = manifesto.ultima()
+        retomada = f" (nova tentativa retoma após '{etapa}')" if etapa else ""
+        log_status(job, f"Erro ao processar ATA: {e}{retomada}", erro=True)
     finally:
+        ata_status[job]["fim"] = time.time()
+        encerrar_token(token)
+        manifesto.fechar()
+        alocador_nucleos.sair(job)
         if callback:
-            caminho_final = caminho if ata_status[event_id]["ready"] else None
+            # Caminho do que foi gravado de fato (a ATA final, ou o rascunho se a final falhou)
+            caminho_final = ata_status[job].get("docx_path") if ata_status[job]["ready"] else None
             callback(event_id, caminho_final)
-
@@ -0,0 +1,125 @@
+# controllers_vad.py
+import os
+from bisect import bisect_right
+
+import numpy as np
+
+from controllers.controllers_transcricao import SAMPLE_RATE
+
+# ----------------------------
+# Configuração do VAD (.env)
+# ----------------------------
+# Desligado por padrão: ligar muda o áudio entregue ao modelo (e o texto das transcrições)
+VAD_ATIVO = os.getenv("VAD_ATIVO", "0") == "1"
+VAD_QUADRO_MS = int(os.getenv("VAD_QUADRO_MS", "30"))
+# Limiar = piso de ruído (percentil 10 da energia) + margem, nunca abaixo de VAD_PISO_DB
+VAD_MARGEM_DB = float(os.getenv("VAD_MARGEM_DB", "10"))
+VAD_PISO_DB = float(os.getenv("VAD_PISO_DB", "-50"))
+# Só corta silêncios com pelo menos essa duração; pausas curtas ficam no áudio
+VAD_SILENCIO_MIN_S = float(os.getenv("VAD_SILENCIO_MIN_S", "2.0"))
+# Margem de áudio mantida antes/depois de cada trecho de fala
+VAD_BORDA_S = float(os.getenv("VAD_BORDA_S", "0.3"))
+
+
+def parametros_vad():
+    """Parâmetros que mudam o áudio entregue ao modelo (entram na chave do cache)."""
+    return {
+        "quadro_ms": VAD_QUADRO_MS,
+        "margem_db": VAD_MARGEM_DB,
+        "piso_db": VAD_PISO_DB,
+        "silencio_min_s": VAD_SILENCIO_MIN_S,
+        "borda_s": VAD_BORDA_S,
+    }
+
+
+def _energia_db(audio, quadro):
+    n = len(audio) // quadro
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    quadros = audio[:n * quadro].reshape(n, quadro)
+    rms = np.sqrt(np.mean(quadros.astype(np.float32) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def detectar_fala(audio):
+    """
+    Trechos com fala em `audio` (float32 16 kHz) como [(inicio, fim)] em amostras.
+    Detector por energia: quadros acima do limiar adaptativo são fala; silêncios
+    menores que VAD_SILENCIO_MIN_S são absorvidos e cada trecho ganha VAD_BORDA_S
+    de cada lado.
+    """
+    quadro = max(1, int(SAMPLE_RATE * VAD_QUADRO_MS / 1000))
+    energia = _energia_db(audio, quadro)
+    if not len(energia):
+        return [(0, len(audio))] if len(audio) else []
+
+    piso, topo = np.percentile(energia, [10, 90])
+    if topo - piso < VAD_MARGEM_DB and topo > VAD_PISO_DB:
+        # Energia uniforme e acima do piso: gravação sem pausas, nada a cortar
+        return [(0, len(audio))]
+    limiar = max(float(piso) + VAD_MARGEM_DB, VAD_PISO_DB)
+    ativos = np.flatnonzero(energia > limiar)
+    if not len(ativos):
+        return []
+
+    # Agrupa quadros ativos separados por menos de VAD_SILENCIO_MIN_S
+    lacuna_max = max(1, int(VAD_SILENCIO_MIN_S * 1000 / VAD_QUADRO_MS))
+    quebras = np.flatnonzero(np.diff(ativos) > lacuna_max)
+    inicios = np.concatenate(([ativos[0]], ativos[quebras + 1]))
+    fins = np.concatenate((ativos[quebras], [ativos[-1]])) + 1
+
+    borda = int(VAD_BORDA_S * SAMPLE_RATE)
+    regioes = []
+    for i, f in zip(inicios, fins):
+        inicio = max(0, int(i) * quadro - borda)
+        fim = min(len(audio), int(f) * quadro + borda)
+        if regioes and inicio <= regioes[-1][1]:
+            regioes[-1] = (regioes[-1][0], fim)
+        else:
+            regioes.append((inicio, fim))
+    return regioes
+
+
+def compactar(audio, regioes):
+    """
+    Concatena só os trechos de fala. Retorna (audio_compacto, mapa), onde `mapa`
+    é uma lista de (inicio_compacto_s, inicio_original_s) por trecho.
+    """
+    if not regioes:
+        return audio[:0], []
+    mapa = []
+    posicao = 0
+    for inicio, fim in regioes:
+        mapa.append((posicao / SAMPLE_RATE, inicio / SAMPLE_RATE))
+        posicao += fim - inicio
+    compacto = np.concatenate([audio[inicio:fim] for inicio, fim in regioes])
+    return compacto, mapa
+
+
+def _para_original(t, inicios, mapa):
+    i = max(0, bisect_right(inicios, t) - 1)
+    inicio_compacto, inicio_original = mapa[i]
+    return inicio_original + (t - inicio_compacto)
+
+
+def remapear_segmentos(segmentos, mapa):
+    """Converte os tempos dos segmentos do áudio compacto para a linha do tempo original."""
+    if not mapa:
+        return list(segmentos)
+    inicios = [c for c, _ in mapa]
+    return [
+        dict(seg, start=_para_original(seg["start"], inicios, mapa),
+             end=_para_original(seg["end"], inicios, mapa))
+        for seg in segmentos
+    ]
+
+
+def aplicar_vad(audio):
+    """
+    Pré-passo de detecção de voz. Retorna (audio_compacto, mapa, economia_s),
+    com `economia_s` = segundos de silêncio que não vão para o modelo.
+    """
+    regioes = detectar_fala(audio)
+    compacto, mapa = compactar(audio, regioes)
+    economia_s = (len(audio) - len(compacto)) / SAMPLE_RATE
+    return compacto, mapa, economia_s
@@ -1,7 +1,12 @@
 # controllers_whisper.py
 import os
 import sys
-import whisper
+import time
+import gc
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 
 def get_model_path(model_name):
     model_map = {
@@ -25,4 +30,396 @@ def get_model_path(model_name):
         return os.path.join(sys._MEIPASS, 'models', filename)
     else:
         # No terminal: busca em ./models_whisper/
-        return os.path.join(os.path.dirname(__file__), '..', 'models_whisper', filename)
\ No newline at end of file
+        return os.path.join(os.path.dirname(__file__), '..', 'models_whisper', filename)
+
+
+# ----------------------------
+# Configuração dos modelos (.env)
+# ----------------------------
+WHISPER_MODELO = os.getenv("WHISPER_MODELO", "small")
+WHISPER_MAX_MODELOS = int(os.getenv("WHISPER_MAX_MODELOS", "2"))
+WHISPER_MEMORIA_MB = int(os.getenv("WHISPER_MEMORIA_MB", "4096"))
+WHISPER_OCIOSO_MIN = int(os.getenv("WHISPER_OCIOSO_MIN", "15"))
+# "mmap" = pesos mapeados do disco e compartilhados entre processos; "padrao" = whisper.load_model
+WHISPER_CARGA = os.getenv("WHISPER_CARGA", "mmap")
+# 1 = camadas Linear quantizadas em int8 (quantização dinâmica, só CPU)
+WHISPER_INT8 = os.getenv("WHISPER_INT8", "0") == "1"
+
+# RAM aproximada de cada modelo em fp32 (usada antes de carregar; depois vale a medida real)
+MEMORIA_ESTIMADA_MB = {
+    "tiny": 150,
+    "base": 300,
+    "small": 950,
+    "medium": 3000,
+    "large": 6000,
+    "large-v1": 6000,
+    "large-v2": 6000,
+    "large-v3": 6000,
+}
+
+# Real-time factor (segundos de processamento por segundo de áudio) aproximado
+# no CPU em fp32; usado até existir medição real (ver controllers_transcricao)
+RTF_ESTIMADO = {
+    "tiny": 0.05,
+    "base": 0.1,
+    "small": 0.3,
+    "medium": 0.9,
+    "large": 2.0,
+    "large-v1": 2.0,
+    "large-v2": 2.0,
+    "large-v3": 2.0,
+}
+
+
+def origem_modelo(nome):
+    """
+    Caminho do .pt em models_whisper/ (via get_model_path); senão um <nome>.pt na
+    raiz do app ou em sys._MEIPASS; senão o próprio nome para o whisper baixar.
+    """
+    caminho = get_model_path(nome)
+    if os.path.exists(caminho):
+        return os.path.abspath(caminho)
+
+    if getattr(sys, 'frozen', False):
+        base_path = sys._MEIPASS
+    else:
+        base_path = os.path.abspath(".")
+    legado = os.path.join(base_path, f"{nome}.pt")
+    return legado if os.path.exists(legado) else nome
+
+
+# ----------------------------
+# Carga dos pesos
+# ----------------------------
+def _checkpoint_fp32(origem):
+    """
+    Os checkpoints oficiais vêm em fp16, mas no CPU o Whisper roda em fp32.
+    Converte uma única vez para <nome>.fp32.pt ao lado do original, que pode
+    então ser mapeado em memória sem nenhuma conversão na carga.
+    """
+    import torch
+    destino = os.path.splitext(origem)[0] + ".fp32.pt"
+    if os.path.exists(destino) and os.path.getmtime(destino) >= os.path.getmtime(origem):
+        return destino
+
+    logging.info(f"Gerando checkpoint fp32 para mmap: {destino}")
+    checkpoint = torch.load(origem, map_location="cpu")
+    estado = {
+        k: v.float() if v.is_floating_point() else v
+        for k, v in checkpoint["model_state_dict"].items()
+    }
+    # Temporário por processo: os workers do pool convertem ao mesmo tempo na
+    # primeira carga; cada um grava o seu e o os.replace atômico deixa um só
+    tmp = f"{destino}.{os.getpid()}.tmp"
+    try:
+        torch.save({"dims": checkpoint["dims"], "model_state_dict": estado}, tmp)
+        os.replace(tmp, destino)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return destino
+
+
+def _carregar_mmap(origem):
+    """
+    torch.load(mmap=True) + load_state_dict(assign=True): os parâmetros apontam
+    para as páginas do arquivo no page cache. Vários processos carregando o mesmo
+    arquivo compartilham essas páginas (somente leitura), então N workers custam
+    perto da RSS de um modelo e a carga não precisa desserializar nada.
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    checkpoint = torch.load(_checkpoint_fp32(origem), map_location="cpu", mmap=True)
+    dims = ModelDimensions(**checkpoint["dims"])
+
+    try:
+        # Sem alocar nem inicializar pesos que seriam descartados em seguida
+        with torch.device("meta"):
+            modelo = Whisper(dims)
+    except Exception:
+        modelo = Whisper(dims)
+    modelo.load_state_dict(checkpoint["model_state_dict"], assign=True)
+
+    # Buffers não persistentes não estão no checkpoint: recria no CPU (mesma lógica do whisper.model)
+    if modelo.decoder.mask.is_meta:
+        mask = torch.empty(dims.n_text_ctx, dims.n_text_ctx).fill_(-float("inf")).triu_(1)
+        modelo.decoder.register_buffer("mask", mask, persistent=False)
+    if modelo.alignment_heads.is_meta:
+        all_heads = torch.zeros(dims.n_text_layer, dims.n_text_head, dtype=torch.bool)
+        all_heads[dims.n_text_layer // 2:] = True
+        modelo.register_buffer("alignment_heads", all_heads.to_sparse(), persistent=False)
+
+    restantes = [n for n, t in list(modelo.named_parameters()) + list(modelo.named_buffers()) if t.is_meta]
+    if restantes:
+        raise RuntimeError(f"tensores sem valor após a carga mmap: {restantes}")
+    return modelo.eval()
+
+
+def quantizar_int8(modelo):
+    """
+    Quantização dinâmica int8 das camadas Linear (pesos int8, ativações
+    quantizadas em tempo de execução). Feita no próprio modelo, sem cópia.
+    """
+    import torch
+    # whisper.model.Linear só reimplementa o forward com cast de dtype; o
+    # quantize_dynamic reconhece apenas nn.Linear exato, então troca a classe.
+    for m in modelo.modules():
+        if isinstance(m, torch.nn.Linear) and type(m) is not torch.nn.Linear:
+            m.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(modelo, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+
+def _carregar_int8(origem, modo):
+    """
+    Modelo int8 com os pesos quantizados em cache em <nome>.int8.pt, ao lado do
+    .pt original. A quantização só roda na primeira carga (ou se o original mudar).
+    """
+    import torch
+    from whisper.model import ModelDimensions, Whisper
+
+    cache = os.path.splitext(origem)[0] + ".int8.pt"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(origem):
+        dados = torch.load(cache, map_location="cpu", weights_only=False)
+        modelo = quantizar_int8(Whisper(ModelDimensions(**dados["dims"])))
+        modelo.load_state_dict(dados["model_state_dict"])
+        return modelo.eval()
+
+    modelo = carregar_modelo(origem, modo=modo, int8=False)
+    dims = dict(vars(modelo.dims))
+    modelo = quantizar_int8(modelo).eval()
+    tmp = f"{cache}.{os.getpid()}.tmp"  # por processo, como em _checkpoint_fp32
+    try:
+        torch.save({"dims": dims, "model_state_dict": modelo.state_dict()}, tmp)
+        os.replace(tmp, cache)
+        logging.info(f"Pesos int8 salvos em cache: {cache}")
+    except OSError as e:
+        logging.warning(f"Não foi possível salvar o cache int8 ({cache}): {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return modelo
+
+
+def carregar_modelo(origem, modo=None, int8=None):
+    """
+    Carrega um modelo Whisper a partir de um .pt ou nome. No modo "mmap" (padrão)
+    usa _carregar_mmap quando a origem é um arquivo; se o torch/whisper instalado
+    não suportar, cai para whisper.load_model. Com `int8` (padrão WHISPER_INT8)
+    devolve a versão quantizada.
+    """
+    modo = modo or WHISPER_CARGA
+    int8 = WHISPER_INT8 if int8 is None else int8
+    if int8:
+        if os.path.isfile(origem):
+            return _carregar_int8(origem, modo)
+        logging.warning(f"Modo int8 exige o .pt local; carregando {origem} em fp32.")
+
+    if modo == "mmap" and os.path.isfile(origem):
+        try:
+            return _carregar_mmap(origem)
+        except Exception as e:
+            logging.warning(f"Carga mmap indisponível para {origem} ({e}); usando whisper.load_model.")
+
+    import whisper
+    return whisper.load_model(origem)
+
+
+# ----------------------------
+# Registro de modelos residentes
+# ----------------------------
+class RegistroModelos:
+    """
+    Carrega qualquer tamanho suportado por get_model_path sob demanda e mantém
+    no máximo WHISPER_MAX_MODELOS residentes dentro de WHISPER_MEMORIA_MB,
+    descarregando o usado há mais tempo (LRU). Modelos parados por mais de
+    WHISPER_OCIOSO_MIN minutos são descarregados para devolver a RAM.
+    Modelos em uso (dentro de `usar`) nunca são descarregados.
+    """
+
+    def __init__(self, max_modelos=None, memoria_mb=None, ocioso_min=None):
+        self.max_modelos = max(1, max_modelos or WHISPER_MAX_MODELOS)
+        self.memoria_mb = memoria_mb or WHISPER_MEMORIA_MB
+        self.ocioso_s = (ocioso_min if ocioso_min is not None else WHISPER_OCIOSO_MIN) * 60
+        self._residentes = OrderedDict()  # nome -> {"modelo", "memoria_mb", "ultimo_uso", "em_uso"}
+        self._estados = {}
+        self._cond = threading.Condition()
+        self._monitor = None
+
+    def origem(self, nome):
+        return origem_modelo(nome)
+
+    def residente(self, nome):
+        with self._cond:
+            return nome in self._residentes
+
+    def estado(self, nome):
+        with self._cond:
+            return self._estados.get(nome, "não carregado")
+
+    def obter(self, nome):
+        """Retorna o modelo, carregando se necessário. Prefira `usar` durante a transcrição."""
+        with self.usar(nome) as modelo:
+            return modelo
+
+    @contextmanager
+    def usar(self, nome):
+        """Marca o modelo como em uso enquanto o bloco roda."""
+        modelo = self._reservar(nome)
+        try:
+            yield modelo
+        finally:
+            with self._cond:
+                entrada = self._residentes.get(nome)
+                if entrada:
+                    entrada["em_uso"] -= 1
+                    entrada["ultimo_uso"] = time.monotonic()
+                self._cond.notify_all()
+
+    def descarregar(self, nome):
+        with self._cond:
+            entrada = self._residentes.get(nome)
+            if not entrada or entrada["em_uso"]:
+                return False
+            del self._residentes[nome]
+            self._estados[nome] = "descarregado"
+        gc.collect()
+        logging.info(f"Modelo Whisper '{nome}' descarregado.")
+        return True
+
+    # ----------------------------
+    # Internos
+    # ----------------------------
+    def _reservar(self, nome):
+        get_model_path(nome)  # valida o nome
+        with self._cond:
+            while True:
+                entrada = self._residentes.get(nome)
+                if entrada:
+                    entrada["em_uso"] += 1
+                    entrada["ultimo_uso"] = time.monotonic()
+                    self._residentes.move_to_end(nome)
+                    return entrada["modelo"]
+                if self._estados.get(nome) != "carregando":
+                    break
+                self._cond.wait()  # outra thread já está carregando este modelo
+            self._estados[nome] = "carregando"
+
+        try:
+            self._liberar_espaco(MEMORIA_ESTIMADA_MB.get(nome, 1000))
+            modelo, memoria_mb = self._carregar(nome)
+        except Exception as e:
+            with self._cond:
+                self._estados[nome] = f"erro ({e})"
+                self._cond.notify_all()
+            raise
+
+        with self._cond:
+            self._residentes[nome] = {
+                "modelo": modelo,
+                "memoria_mb": memoria_mb,
+                "ultimo_uso": time.monotonic(),
+                "em_uso": 1,
+            }
+            self._estados[nome] = "pronto"
+            self._cond.notify_all()
+            self._iniciar_monitor()
+        self._liberar_espaco(0)
+        return modelo
+
+    def _carregar(self, nome):
+        origem = self.origem(nome)
+        logging.info(f"Carregando modelo Whisper '{nome}' de: {origem}")
+        t0 = time.perf_counter()
+        modelo = carregar_modelo(origem)
+        memoria_mb = sum(p.numel() * p.element_size() for p in modelo.parameters()) / (1024 * 1024)
+        logging.info(f"Modelo Whisper '{nome}' carregado em {time.perf_counter() - t0:.1f}s ({memoria_mb:.0f} MB).")
+        return modelo, memoria_mb
+
+    def _liberar_espaco(self, memoria_nova_mb):
+        """Descarrega modelos LRU ociosos até caber mais um modelo de `memoria_nova_mb`."""
+        while True:
+            with self._cond:
+                usados = sum(e["memoria_mb"] for e in self._residentes.values())
+                excesso = (
+                    len(self._residentes) + (1 if memoria_nova_mb else 0) > self.max_modelos
+                    or usados + memoria_nova_mb > self.memoria_mb
+                )
+                candidatos = [n for n, e in self._residentes.items() if not e["em_uso"]]
+            if not excesso or not candidatos:
+                return
+            self.descarregar(candidatos[0])
+
+    def _iniciar_monitor(self):
+        if self._monitor is None and self.ocioso_s > 0:
+            self._monitor = threading.Thread(target=self._monitorar_ociosos, name="whisper-ocioso", daemon=True)
+            self._monitor.start()
+
+    def _monitorar_ociosos(self):
+        while True:
+            time.sleep(min(60, self.ocioso_s))
+            agora = time.monotonic()
+            with self._cond:
+                ociosos = [
+                    n for n, e in self._residentes.items()
+                    if not e["em_uso"] and agora - e["ultimo_uso"] > self.ocioso_s
+                ]
+            for nome in ociosos:
+                self.descarregar(nome)
+
+
+registro_modelos = RegistroModelos()
+
+
+# ----------------------------
+# Modelo padrão do app (aquecido em background)
+# ----------------------------
+class GerenciadorModelo:
+    """
+    Modelo padrão do app sobre o RegistroModelos. O import de whisper/torch só
+    acontece na carga, então a janela do Kivy abre sem esperar pelo modelo;
+    `aquecer` dispara a carga numa thread própria.
+    """
+
+    def __init__(self, nome=None, registro=None):
+        self.nome = nome or WHISPER_MODELO
+        self.registro = registro or registro_modelos
+        self._lock = threading.Lock()
+        self._aquecendo = False
+
+    @property
+    def origem(self):
+        return self.registro.origem(self.nome)
+
+    def aquecer(self):
+        """Inicia a carga em background (ignorado se já está carregado ou carregando)."""
+        with self._lock:
+            if self._aquecendo or self.registro.residente(self.nome):
+                return
+            self._aquecendo = True
+        threading.Thread(target=self._aquecer, name="whisper-loader", daemon=True).start()
+
+    def pronto(self):
+        return self.registro.residente(self.nome)
+
+    def obter(self):
+        """Espera a carga (se houver) e retorna o modelo."""
+        return self.registro.obter(self.nome)
+
+    def usar(self):
+        return self.registro.usar(self.nome)
+
+    def descricao(self):
+        """Texto curto para a interface."""
+        return f"Modelo Whisper ({self.nome}): {self.registro.estado(self.nome)}"
+
+    def _aquecer(self):
+        try:
+            self.registro.obter(self.nome)
+        except Exception as e:
+            logging.error(f"Falha ao carregar modelo Whisper: {e}")
+        finally:
+            with self._lock:
+                self._aquecendo = False
+
+
+modelo_whisper = GerenciadorModelo()
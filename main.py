@@ -1,9 +1,11 @@
 # main.py
+import multiprocessing
 from kivy.app import App
 from kivy.uix.screenmanager import ScreenManager
 from views.login_screen import LoginScreen
 from views.cadastro_screen import CadastroScreen
 from views.main_screen import MainScreen
+from controllers.controllers_transcricao import obter_backend
 
 class AtaApp(App):
     def build(self):
@@ -15,5 +17,11 @@ class AtaApp(App):
         sm.add_widget(MainScreen(name='main'))
         return sm
 
+    def on_start(self):
+        # Janela já está na tela: agora sim carrega o modelo de transcrição em background
+        obter_backend().aquecer()
+
 if __name__ == '__main__':
+    # Necessário para o pool de transcrição no executável do PyInstaller
+    multiprocessing.freeze_support()
     AtaApp().run()
\ No newline at end of file
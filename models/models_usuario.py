@@ -1,7 +1,7 @@
 import os
 import sys
 import json
-from sqlalchemy import create_engine, Column, Integer, String, Text
+from sqlalchemy import create_engine, Column, Integer, String, Text, Float, DateTime, UniqueConstraint
 from sqlalchemy.orm import sessionmaker, declarative_base, validates
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
@@ -86,6 +86,31 @@ class Usuario(Base):
                 raise ValueError(f"google_token inválido: {e}")
         return value
 
+# ----------------------------
+# Jobs de ATA (estado persistido do processamento)
+# ----------------------------
+class AtaJob(Base):
+    __tablename__ = 'ata_job'
+    # O mesmo evento do Calendar aparece para todos os participantes: um job por usuário
+    __table_args__ = (UniqueConstraint('usuario_email', 'event_id', name='uq_ata_job_usuario_evento'),)
+
+    id = Column(Integer, primary_key=True)
+    event_id = Column(String(255), nullable=False)
+    usuario_email = Column(String(120), nullable=False)
+    processo = Column(String(100), nullable=True)  # instância (host:pid) que grava o job
+    estado = Column(String(20), nullable=False, default="fila")  # fila, processando, concluido, erro, interrompido, cancelado
+    etapa = Column(Text, nullable=True)  # última mensagem de progresso
+    perfil = Column(String(20), nullable=True)
+    modelo = Column(String(20), nullable=True)
+    tempo_transcricao = Column(Float, nullable=True)
+    iniciado_em = Column(DateTime, nullable=True)
+    concluido_em = Column(DateTime, nullable=True)
+    docx_path = Column(Text, nullable=True)
+    erro = Column(Text, nullable=True)
+    resumo = Column(Text, nullable=True)
+    detalhes = Column(Text, nullable=True)  # demais campos do status, em JSON
+    atualizado_em = Column(DateTime, nullable=True)
+
 # ----------------------------
 # Criar tabelas
 # ----------------------------
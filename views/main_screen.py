@@ -1,24 +1,72 @@
 # views/main_screen_safe.py
 from kivy.uix.screenmanager import Screen
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.gridlayout import GridLayout
 from kivy.uix.scrollview import ScrollView
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
 from kivy.uix.label import Label
 from kivy.uix.button import Button
 from kivy.uix.textinput import TextInput
+from kivy.uix.spinner import Spinner
 from kivy.clock import Clock, mainthread
 import threading
+import logging
 import webbrowser
 import os
 from kivy.graphics import Color, Rectangle
-from datetime import datetime
-
-from controllers.controllers_usuario import processar_ata, ata_status, listar_reunioes, get_user_upload_folder, gerar_resumo_texto
+from datetime import datetime, timedelta, timezone
+
+from controllers.controllers_usuario import ata_status, get_user_upload_folder, gerar_resumo_texto
+from controllers.controllers_fila import enfileirar_ata, cancelar_ata, FilaCheiaError, AtaEmAndamentoError
+from controllers.controllers_status import chave_job
+from controllers.controllers_agenda import obter_agenda
+from controllers.controllers_busca import IndiceEventos
+from controllers.controllers_transcricao import obter_backend, PERFIS_TRANSCRICAO, TRANSCRICAO_PERFIL
 from auth import carregar_token_google, salvar_token_google
 from oauth_helper import iniciar_oauth_kivy
 from kivy.uix.popup import Popup
 
 
+class LinhaReuniao(RecycleDataViewBehavior, BoxLayout):
+    """
+    Linha reciclada da lista de reuniões. O widget não guarda estado próprio:
+    tudo vem do dict correspondente em `rv.data` (título, status do job, DOCX).
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(orientation='horizontal', spacing=5, **kwargs)
+        self.tela = None
+        self.event_id = None
+
+        self.titulo_label = Label(size_hint_x=0.35, color=(0, 0, 0, 1))
+        self.status_label = Label(size_hint_x=0.2, color=(0, 0, 0, 1))
+        self.gerar_btn = Button(text="Gerar ATA", size_hint_x=0.12)
+        self.cancelar_btn = Button(text="Cancelar", size_hint_x=0.1)
+        self.resumo_btn = Button(text="Resumo ATA", size_hint_x=0.12)
+        self.download_btn = Button(text="Baixar DOCX", size_hint_x=0.12)
+
+        self.gerar_btn.bind(on_release=lambda inst: self.tela.gerar_ata(self.event_id))
+        self.cancelar_btn.bind(on_release=lambda inst: self.tela.cancelar_ata(self.event_id))
+        self.resumo_btn.bind(on_release=lambda inst: self.tela.mostrar_resumo_ata(self.event_id))
+        self.download_btn.bind(on_release=lambda inst: self.tela.abrir_docx(self.event_id))
+
+        for w in (self.titulo_label, self.status_label, self.gerar_btn, self.cancelar_btn,
+                  self.resumo_btn, self.download_btn):
+            self.add_widget(w)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.tela = rv.tela
+        self.event_id = data["event_id"]
+        self.titulo_label.text = data["titulo"]
+        self.status_label.text = data["status"]
+        self.gerar_btn.disabled = data["processando"]
+        self.cancelar_btn.disabled = not data["processando"]
+        self.resumo_btn.disabled = not data["pronto"]
+        self.download_btn.disabled = not data["pronto"]
+        return super().refresh_view_attrs(rv, index, data)
+
+
 class MainScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -29,12 +77,17 @@ class MainScreen(Screen):
             self.bg_rect = Rectangle(pos=self.pos, size=self.size)
         self.bind(size=self._update_bg_rect, pos=self._update_bg_rect)
 
-        # Dados e paginação
+        # Dados da lista
         self.todos_eventos = []
         self.eventos_filtrados = []
-        self.pagina_atual = 0
-        self.itens_por_pagina = 10
+        self.indice = IndiceEventos([])
         self._search_trigger = None
+        self._expandindo = False
+        self._expansao_falhou = False  # suspende a expansão automática até a próxima rolagem/carga
+        # Estado dos jobs por event_id (status, processando, docx_path); as linhas leem daqui
+        self._jobs = {}
+        self._linha_por_evento = {}
+        self._eventos_por_id = {}
 
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
         
@@ -46,6 +99,16 @@ class MainScreen(Screen):
             color=(0.1, 0.2, 0.6, 1)
         )
         layout.add_widget(self.label)
+
+        # Prontidão do modelo de transcrição (carregado em background)
+        self.modelo_label = Label(
+            text=obter_backend().descricao(),
+            size_hint_y=None,
+            height=20,
+            font_size=12,
+            color=(0.3, 0.3, 0.3, 1)
+        )
+        layout.add_widget(self.modelo_label)
       
         # Botão autenticação Google
         self.auth_btn = Button(
@@ -93,26 +156,36 @@ class MainScreen(Screen):
         self.data_fim_input.bind(text=self.on_search_text)
         busca_layout.add_widget(self.data_fim_input)
 
+        # Perfil de transcrição (velocidade x precisão)
+        self.perfil_spinner = Spinner(
+            text=TRANSCRICAO_PERFIL,
+            values=list(PERFIS_TRANSCRICAO),
+            size_hint_x=0.25,
+        )
+        busca_layout.add_widget(self.perfil_spinner)
+
         layout.add_widget(busca_layout)
 
-        # Scroll e grid
-        self.scroll = ScrollView()
-        self.grid = GridLayout(cols=1, size_hint_y=None, spacing=10)
-        self.grid.bind(minimum_height=self.grid.setter('height'))
-        self.scroll.add_widget(self.grid)
-        layout.add_widget(self.scroll)
-
-        # Paginação
-        pag_layout = BoxLayout(orientation='horizontal', size_hint_y=None, height=40, spacing=10)
-        self.btn_anterior = Button(text="◀ Anterior", size_hint_x=0.2)
-        self.pagina_label = Label(text="Página 1 de 1", size_hint_x=0.6, color=(0, 0, 0, 1))
-        self.btn_proximo = Button(text="Próxima ▶", size_hint_x=0.2)
-        self.btn_anterior.bind(on_release=self.pagina_anterior)
-        self.btn_proximo.bind(on_release=self.pagina_proxima)
-        pag_layout.add_widget(self.btn_anterior)
-        pag_layout.add_widget(self.pagina_label)
-        pag_layout.add_widget(self.btn_proximo)
-        layout.add_widget(pag_layout)
+        # Lista virtualizada: só as linhas visíveis existem como widgets
+        self.rv = RecycleView(viewclass=LinhaReuniao)
+        self.rv.tela = self
+        linhas_layout = RecycleBoxLayout(
+            orientation='vertical',
+            default_size=(None, 50),
+            default_size_hint=(1, None),
+            size_hint_y=None,
+            spacing=10
+        )
+        linhas_layout.bind(minimum_height=linhas_layout.setter('height'))
+        self.rv.add_widget(linhas_layout)
+        self.rv.bind(scroll_y=self.on_scroll_lista)
+        # Lista mais curta que a área visível não rola: carrega mais assim que o layout assenta
+        self._trigger_preencher = Clock.create_trigger(self._preencher_lista, 0.1)
+        linhas_layout.bind(height=lambda *a: self._trigger_preencher())
+        self.rv.bind(height=lambda *a: self._trigger_preencher())
+        layout.add_widget(self.rv)
+
+        Clock.schedule_interval(self._acompanhar_jobs, 1)
 
                # --- Botão de Voltar para Login ---
         btn_voltar = Button(
@@ -156,25 +229,104 @@ class MainScreen(Screen):
     # ----------------------------
     # Carregar reuniões
     # ----------------------------
+    def on_enter(self, *args):
+        usuario = getattr(self.manager, "usuario_logado", None)
+        if not usuario:
+            return
+        threading.Thread(target=self._carregar_reunioes_thread, kwargs={"usar_cache": True}, daemon=True).start()
+
     def carregar_reunioes(self):
         if not hasattr(self.manager, "creds") or not self.manager.creds:
             self.label.text = "Autentique-se para carregar reuniões."
             return
         threading.Thread(target=self._carregar_reunioes_thread, daemon=True).start()
 
-    def _carregar_reunioes_thread(self):
+    def _carregar_reunioes_thread(self, usar_cache=False):
+        agenda = obter_agenda(self.manager.usuario_logado.email)
+        self._expansao_falhou = False
+
+        # Mostra na hora o que já está na agenda local; a sincronização roda em seguida
+        if usar_cache:
+            eventos_cache = agenda.listar()
+            if eventos_cache:
+                self._indexar_eventos(eventos_cache, f"{len(eventos_cache)} reuniões (cache). Sincronizando...")
+            # Token do banco (e refresh pela rede) só depois de a lista em cache aparecer
+            if not self.manager.creds:
+                try:
+                    self.manager.creds = carregar_token_google(self.manager.usuario_logado.id)
+                except Exception as e:
+                    logging.warning(f"Falha ao carregar o token do Google: {e}")
+            if not self.manager.creds:
+                self._mostrar_mensagem("Autentique-se para carregar reuniões.")
+                return
+
+        try:
+            events = agenda.sincronizar(self.manager.creds)
+            self._indexar_eventos(events, f"{len(events)} reuniões carregadas.")
+        except Exception as e:
+            self._aplicar_eventos(self.indice, f"Erro ao carregar reuniões: {e}")
+
+    def _indexar_eventos(self, events, mensagem):
+        """Monta o índice de busca fora da thread do Kivy e só então publica a lista."""
+        events = events or []
+        # ATAs já geradas (ou interrompidas) em execuções anteriores do app
         try:
-            events = listar_reunioes(self.manager.creds)
-            self.todos_eventos = events if events else []
-            self.eventos_filtrados = self.todos_eventos[:]
-            self.pagina_atual = 0
-            self.atualizar_reunioes()
-            self.label.text = f"{len(self.todos_eventos)} reuniões carregadas."
+            historico = ata_status.carregar(self.manager.usuario_logado.email, [e.get('id') for e in events])
         except Exception as e:
-            self.label.text = f"Erro ao carregar reuniões: {e}"
-            self.todos_eventos = []
-            self.eventos_filtrados = []
-            self.atualizar_reunioes()
+            logging.warning(f"Histórico de ATAs indisponível: {e}")
+            historico = {}
+        self._aplicar_eventos(IndiceEventos(events), mensagem, historico)
+
+    @mainthread
+    def _aplicar_eventos(self, indice, mensagem, historico=None):
+        for event_id, status in (historico or {}).items():
+            if event_id in self._jobs:
+                continue
+            docx_path = status.get("docx_path")
+            self._jobs[event_id] = {
+                "status": status.get("mensagem", ""),
+                "processando": False,
+                "docx_path": docx_path if status.get("ready") and docx_path and os.path.exists(docx_path) else None,
+            }
+        self.indice = indice
+        self.todos_eventos = indice.eventos
+        self.filtrar_eventos()
+        self.label.text = mensagem
+
+    @mainthread
+    def _mostrar_mensagem(self, mensagem):
+        self.label.text = mensagem
+
+    def _expandir_agenda(self, novo_inicio=None, novo_fim=None):
+        """
+        Carrega em background o período que falta na janela da agenda: até as
+        datas do filtro, ou (rolagem) mais reuniões antigas até o histórico esgotar.
+        """
+        usuario = getattr(self.manager, "usuario_logado", None)
+        if self._expandindo or not usuario or not self.manager.creds:
+            return
+        agenda = obter_agenda(usuario.email)
+        if novo_inicio is None and novo_fim is None:
+            if not agenda.pode_expandir():
+                return
+        elif agenda.cobre(novo_inicio, novo_fim):
+            return
+
+        def _thread():
+            try:
+                events = agenda.expandir(self.manager.creds, novo_inicio, novo_fim)
+                # As reuniões antigas entram no fim da lista (ordem: mais recentes primeiro)
+                fim_historico = "" if agenda.pode_expandir() else " Não há reuniões mais antigas."
+                self._indexar_eventos(events, f"{len(events)} reuniões carregadas.{fim_historico}")
+            except Exception as e:
+                self._expansao_falhou = True
+                self._aplicar_eventos(self.indice, f"Erro ao carregar reuniões antigas: {e}")
+            finally:
+                self._expandindo = False
+
+        self._expandindo = True
+        self.label.text = "Carregando mais reuniões..."
+        threading.Thread(target=_thread, daemon=True).start()
 
     # ----------------------------
     # Filtro de reuniões
@@ -185,7 +337,7 @@ class MainScreen(Screen):
         self._search_trigger = Clock.schedule_once(lambda dt: self.filtrar_eventos(), 0.3)
 
     def filtrar_eventos(self):
-        termo = (self.search_input.text or "").lower().strip()
+        termo = (self.search_input.text or "").strip()
         data_inicio_txt = (self.data_inicio_input.text or "").strip()
         data_fim_txt = (self.data_fim_input.text or "").strip()
 
@@ -198,151 +350,164 @@ class MainScreen(Screen):
         data_inicio = parse_data_br(data_inicio_txt)
         data_fim = parse_data_br(data_fim_txt)
 
-        filtrados = []
-        for e in self.todos_eventos:
-            summary = (e.get('summary') or "").lower()
-            description = (e.get('description') or "").lower()
-            organizer = (e.get('organizer', {}).get('email') or "").lower()
+        # Datas fora da janela já carregada: busca só o período que falta
+        if data_inicio or data_fim:
+            self._expandir_agenda(
+                datetime.combine(data_inicio, datetime.min.time(), tzinfo=timezone.utc) if data_inicio else None,
+                datetime.combine(data_fim + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc) if data_fim else None,
+            )
 
-            start_obj = e.get('start', {})
-            start_str = start_obj.get('dateTime') or start_obj.get('date') or ""
-            data_evento_date = None
-            if start_str:
-                try:
-                    data_evento_date = datetime.strptime(start_str[:10], "%Y-%m-%d").date()
-                except Exception:
-                    pass
-
-            cond_texto = not termo or (termo in summary or termo in description or termo in organizer)
-            cond_data = True
-            if data_inicio and data_fim and data_evento_date:
-                cond_data = data_inicio <= data_evento_date <= data_fim
-            elif data_inicio and data_evento_date:
-                cond_data = data_evento_date >= data_inicio
-            elif data_fim and data_evento_date:
-                cond_data = data_evento_date <= data_fim
-            elif (data_inicio or data_fim) and not data_evento_date:
-                cond_data = False
-
-            if cond_texto and cond_data:
-                filtrados.append(e)
+        filtrados = self.indice.buscar(termo, data_inicio, data_fim)
 
         self.eventos_filtrados = filtrados
-        self.pagina_atual = 0
         self.atualizar_reunioes()
 
     # ----------------------------
     # Atualizar interface
     # ----------------------------
-    @mainthread
-    def atualizar_reunioes(self):
-        self.grid.clear_widgets()
-        total = len(self.eventos_filtrados)
-        total_paginas = max(1, (total + self.itens_por_pagina - 1) // self.itens_por_pagina)
-        inicio = self.pagina_atual * self.itens_por_pagina
-        fim = inicio + self.itens_por_pagina
-        pagina_eventos = self.eventos_filtrados[inicio:fim]
-
-        for e in pagina_eventos:
-            box = BoxLayout(orientation='horizontal', size_hint_y=None, height=50, spacing=5)
-            start_str = e.get('start', {}).get('dateTime') or e.get('start', {}).get('date') or ""
-            data_mostrada = ""
-            if start_str:
-                try:
-                    data_mostrada = datetime.strptime(start_str[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
-                except Exception:
-                    data_mostrada = start_str
-
-            title_text = f"{e.get('summary', 'Sem título')} — {data_mostrada}"
-            label = Label(text=title_text, size_hint_x=0.4, color=(0, 0, 0, 1))
-            box.add_widget(label)
-
-            status_label = Label(text="", size_hint_x=0.2, color=(0, 0, 0, 1))
-            box.add_widget(status_label)
-
-            gerar_btn = Button(text="Gerar ATA", size_hint_x=0.15)
-            resumo_btn = Button(text="Resumo ATA", size_hint_x=0.15, disabled=True)
-            download_btn = Button(text="Baixar DOCX", size_hint_x=0.15, disabled=True)
-
-            def abrir_docx(inst):
-                path = getattr(inst, 'docx_path', None)
-                if path and os.path.exists(path):
-                    import subprocess, sys
-                    try:
-                        if sys.platform == "win32":
-                            os.startfile(path)
-                        elif sys.platform == "darwin":
-                            subprocess.run(["open", path])
-                        else:
-                            subprocess.run(["xdg-open", path])
-                    except Exception as ex:
-                        print(f"Erro ao abrir arquivo: {ex}")
-
-            download_btn.bind(on_release=abrir_docx)
-
-            gerar_btn.bind(
-                on_release=lambda inst, ev=e, lbl=status_label, d_btn=download_btn, r_btn=resumo_btn:
-                self.gerar_ata(ev, lbl, d_btn, r_btn)
-            )
-            resumo_btn.bind(on_release=lambda inst, ev=e: self.mostrar_resumo_ata(ev))
-
-            box.add_widget(gerar_btn)
-            box.add_widget(resumo_btn)
-            box.add_widget(download_btn)
-            self.grid.add_widget(box)
-
-        self.pagina_label.text = f"Página {self.pagina_atual + 1} de {total_paginas}"
-        self.btn_anterior.disabled = self.pagina_atual == 0
-        self.btn_proximo.disabled = self.pagina_atual >= (total_paginas - 1)
+    def _linha(self, e):
+        start_str = e.get('start', {}).get('dateTime') or e.get('start', {}).get('date') or ""
+        data_mostrada = ""
+        if start_str:
+            try:
+                data_mostrada = datetime.strptime(start_str[:10], "%Y-%m-%d").strftime("%d/%m/%Y")
+            except Exception:
+                data_mostrada = start_str
 
-    # ----------------------------
-    # Paginação
-    # ----------------------------
-    def pagina_anterior(self, instance):
-        if self.pagina_atual > 0:
-            self.pagina_atual -= 1
-            self.atualizar_reunioes()
+        job = self._jobs.get(e.get('id'), {})
+        return {
+            "event_id": e.get('id'),
+            "titulo": f"{e.get('summary', 'Sem título')} — {data_mostrada}",
+            "status": job.get("status", ""),
+            "processando": job.get("processando", False),
+            "pronto": bool(job.get("docx_path")),
+        }
 
-    def pagina_proxima(self, instance):
-        total_paginas = max(1, (len(self.eventos_filtrados) + self.itens_por_pagina - 1) // self.itens_por_pagina)
-        if self.pagina_atual < (total_paginas - 1):
-            self.pagina_atual += 1
-            self.atualizar_reunioes()
+    @mainthread
+    def atualizar_reunioes(self):
+        self._eventos_por_id = {e.get('id'): e for e in self.eventos_filtrados}
+        self._linha_por_evento = {e.get('id'): i for i, e in enumerate(self.eventos_filtrados)}
+        self.rv.data = [self._linha(e) for e in self.eventos_filtrados]
+        self._trigger_preencher()
+
+    def _atualizar_job(self, event_id, **campos):
+        """Atualiza o estado do job e a linha correspondente, se estiver na lista filtrada."""
+        job = self._jobs.setdefault(event_id, {})
+        job.update(campos)
+        i = self._linha_por_evento.get(event_id)
+        if i is not None and i < len(self.rv.data):
+            self.rv.data[i].update(self._linha(self._eventos_por_id[event_id]))
+            self.rv.refresh_from_data()
+
+    def _status_job(self, event_id):
+        """Status do job deste evento para o usuário logado (outros participantes têm o seu)."""
+        usuario = getattr(self.manager, "usuario_logado", None)
+        if not usuario:
+            return {}
+        return ata_status.get(chave_job(usuario.email, event_id), {})
+
+    def _acompanhar_jobs(self, dt):
+        self.modelo_label.text = obter_backend().descricao()
+
+        # Mostra posição na fila / etapa atual dos jobs em andamento
+        for event_id, job in list(self._jobs.items()):
+            if job.get("processando"):
+                mensagem = self._status_job(event_id).get("mensagem")
+                if mensagem and mensagem != job.get("status"):
+                    self._atualizar_job(event_id, status=mensagem)
+
+    def on_scroll_lista(self, instance, scroll_y):
+        # Chegou ao fim da lista: estende a janela da agenda para trás
+        if scroll_y <= 0 and self.rv.data and not self.data_inicio_input.text.strip():
+            self._expansao_falhou = False
+            self._expandir_agenda()
+
+    def _preencher_lista(self, dt):
+        # scroll_y não muda se a lista cabe inteira na tela; então a expansão parte daqui
+        # (sem filtro de texto, para uma busca sem resultados não varrer o histórico todo)
+        if self._expansao_falhou or self.data_inicio_input.text.strip() or self.search_input.text.strip():
+            return
+        if self.rv.layout_manager is None or self.rv.layout_manager.height > self.rv.height:
+            return
+        self._expandir_agenda()
 
     # ----------------------------
     # Gerar ATA (Whisper)
     # ----------------------------
-    def gerar_ata(self, event, status_label, download_btn, resumo_btn):
+    def gerar_ata(self, event_id):
         if not hasattr(self.manager, "usuario_logado") or not self.manager.usuario_logado:
-            status_label.text = "Usuário não logado"
+            self._atualizar_job(event_id, status="Usuário não logado")
             return
 
+        event = self._eventos_por_id[event_id]
+
         @mainthread
         def callback(event_id, docx_path=None):
-            status = ata_status.get(event_id, {})
-            status_label.text = status.get("mensagem", "")
-            if status.get("ready") and docx_path:
-                download_btn.disabled = False
-                resumo_btn.disabled = False
-                download_btn.docx_path = docx_path
-
-        status_label.text = "Processando..."
-        download_btn.disabled = True
-        resumo_btn.disabled = True
-        download_btn.docx_path = None
-
-        threading.Thread(
-            target=processar_ata,
-            args=(event, self.manager.creds, self.manager.usuario_logado.email, callback),
-            daemon=True
-        ).start()
+            job = self._jobs.get(event_id, {})
+            if job.get("callback") is not callback:
+                return  # pedido retirado (cancelado ou de uma sessão anterior)
+            status = self._status_job(event_id)
+            final = status.get("ready") and not status.get("refinando")
+            if job.get("cancelando") and not final:
+                self._atualizar_job(event_id, status="Cancelado.", processando=False, docx_path=None, callback=None)
+                return
+            # No modo duas passadas o rascunho chega antes: a linha segue em andamento
+            self._atualizar_job(
+                event_id,
+                status=status.get("mensagem", ""),
+                processando=bool(status.get("refinando")),
+                docx_path=docx_path if status.get("ready") else None
+            )
+
+        self._atualizar_job(
+            event_id, status="Processando...", processando=True, docx_path=None, callback=callback, cancelando=False
+        )
+
+        try:
+            posicao = enfileirar_ata(
+                event, self.manager.creds, self.manager.usuario_logado.email, callback,
+                perfil=self.perfil_spinner.text
+            )
+            if posicao:
+                self._atualizar_job(event_id, status=f"Na fila (posição {posicao})...")
+            else:
+                self._atualizar_job(event_id, status="ATA já em processamento...")
+        except (FilaCheiaError, AtaEmAndamentoError) as e:
+            self._atualizar_job(event_id, status=str(e), processando=False)
+
+    def cancelar_ata(self, event_id):
+        """
+        Retira o pedido desta tela da ATA; o job só é interrompido se nenhum outro
+        pedido depende dele. O callback atualiza a linha quando o pedido sair.
+        """
+        callback = self._jobs.get(event_id, {}).get("callback")
+        if cancelar_ata(event_id, self.manager.usuario_logado.email, callback):
+            self._atualizar_job(event_id, status="Cancelando...", cancelando=True)
+        else:
+            self._atualizar_job(event_id, processando=False, callback=None)
+
+    def abrir_docx(self, event_id):
+        path = self._jobs.get(event_id, {}).get("docx_path")
+        if path and os.path.exists(path):
+            import subprocess, sys
+            try:
+                if sys.platform == "win32":
+                    os.startfile(path)
+                elif sys.platform == "darwin":
+                    subprocess.run(["open", path])
+                else:
+                    subprocess.run(["xdg-open", path])
+            except Exception as ex:
+                print(f"Erro ao abrir arquivo: {ex}")
 
     # ----------------------------
     # Resumo da ATA (popup)
     # ----------------------------
-    def mostrar_resumo_ata(self, event):
-        event_id = event.get("id")
-        resumo = ata_status.get(event_id, {}).get("resumo", "Resumo ainda não disponível.")
+    def mostrar_resumo_ata(self, event_id):
+        status = self._status_job(event_id)
+        resumo = status.get("resumo", "Resumo ainda não disponível.")
+        if status.get("rascunho"):
+            resumo = f"[Rascunho - a versão final substituirá este texto]\n\n{resumo}"
 
         label = Label(
             text=resumo,
@@ -363,5 +528,11 @@ class MainScreen(Screen):
         popup.open()
 
     def voltar_login(self, instance):
+        # Sair da tela cancela as ATAs em andamento deste usuário
+        for event_id, job in list(self._jobs.items()):
+            if job.get("processando"):
+                self.cancelar_ata(event_id)
+        # O próximo usuário começa sem o estado das linhas deste (callbacks atrasados são ignorados)
+        self._jobs = {}
         if self.manager:
             self.manager.current = "login"